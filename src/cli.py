@@ -1,31 +1,66 @@
 #!/usr/bin/env python3
 import click
+import functools
 import os
 import sys
 from pathlib import Path
-from dotenv import load_dotenv, set_key
+import fast_config
 
 # Configurar la ruta del archivo .env (subir un nivel y entrar a config/)
 BASE_DIR = Path(__file__).parent.parent
 ENV_PATH = BASE_DIR / "config" / ".env"
 
-# Cargar variables de entorno
-load_dotenv(dotenv_path=ENV_PATH)
-
 def verify_env_file():
     """Verifica que el archivo .env exista y sea legible"""
-    if not ENV_PATH.exists():
+    try:
+        _env_text()
+        return True
+    except FileNotFoundError:
         click.echo(f"❌ Error: No se encontró el archivo .env en {ENV_PATH}", err=True)
         click.echo("Ejecute primero: python cli.py init", err=True)
         return False
-    
-    try:
-        ENV_PATH.read_text(encoding='utf-8')
-        return True
     except Exception as e:
         click.echo(f"❌ Error leyendo .env: {str(e)}", err=True)
         return False
 
+@functools.lru_cache(maxsize=4)
+def _read_config_text(path, mtime):
+    """Lee un archivo de configuración pequeño de una vez, sin capa de buffer"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        return os.read(fd, os.fstat(fd).st_size).decode('utf-8')
+    finally:
+        os.close(fd)
+
+def _env_text():
+    """Devuelve el contenido del .env (cacheado mientras no cambie)"""
+    return _read_config_text(str(ENV_PATH), ENV_PATH.stat().st_mtime_ns)
+
+@functools.lru_cache(maxsize=4)
+def _load_config(path, mtime):
+    """Parsea el archivo .env una sola vez por ruta y fecha de modificación"""
+    return fast_config.parse(_read_config_text(path, mtime))
+
+def _invalidate_config():
+    """Descarta las lecturas cacheadas tras modificar el .env"""
+    _read_config_text.cache_clear()
+    _load_config.cache_clear()
+
+def _current_config():
+    """Devuelve la configuración actual del .env (cacheada mientras no cambie)"""
+    try:
+        mtime_ns = ENV_PATH.stat().st_mtime_ns
+    except FileNotFoundError:
+        return {}  # Sin archivo no hay nada que cachear
+    return _load_config(str(ENV_PATH), mtime_ns)
+
+# Claves cuyo valor nunca se muestra completo
+_SECRET_KEYS = frozenset({'TELEGRAM_BOT_TOKEN'})
+
+def _display_value(key, value):
+    """Enmascara los valores secretos antes de mostrarlos"""
+    return f"{'*'*12}{value[-4:]}" if key in _SECRET_KEYS else value
+
 @click.group()
 def cli():
     """Sistema de Monitoreo de Red - Interfaz de Administración"""
@@ -62,78 +97,107 @@ def show_config():
     if not verify_env_file():
         sys.exit(1)
     
-    # Recargar variables para asegurar los últimos cambios
-    load_dotenv(dotenv_path=ENV_PATH, override=True)
-    
-    token = os.getenv('TELEGRAM_BOT_TOKEN')
-    chat_id = os.getenv('TELEGRAM_CHAT_ID')
+    config = _current_config()
     
     click.echo("\n🔧 Configuración actual:")
     click.echo(f"📁 Ubicación .env: {ENV_PATH.absolute()}")
     
     # Mostrar configuración de Telegram
-    if token:
-        click.echo(f"✅ TELEGRAM_BOT_TOKEN: {'*'*12}{token[-4:]}")
-    else:
-        click.echo("❌ TELEGRAM_BOT_TOKEN: No configurado")
-    
-    if chat_id:
-        click.echo(f"✅ TELEGRAM_CHAT_ID: {chat_id}")
-    else:
-        click.echo("❌ TELEGRAM_CHAT_ID: No configurado")
+    for key in ('TELEGRAM_BOT_TOKEN', 'TELEGRAM_CHAT_ID'):
+        value = config.get(key)
+        if value:
+            click.echo(f"✅ {key}: {_display_value(key, value)}")
+        else:
+            click.echo(f"❌ {key}: No configurado")
     
     # Mostrar otras configuraciones
     click.echo("\n⚙️ Otras configuraciones:")
-    click.echo(f"LOG_LEVEL: {os.getenv('LOG_LEVEL', 'No configurado')}")
-    click.echo(f"SCAN_INTERVAL: {os.getenv('SCAN_INTERVAL', 'No configurado')}")
+    click.echo(f"LOG_LEVEL: {config.get('LOG_LEVEL') or 'No configurado'}")
+    click.echo(f"SCAN_INTERVAL: {config.get('SCAN_INTERVAL') or 'No configurado'}")
 
-@cli.command()
-@click.option('--token', prompt='Bot Token de Telegram', hide_input=True)
-def set_telegram_token(token):
-    """Configura el Bot Token de Telegram"""
-    if not verify_env_file():
-        sys.exit(1)
-    
-    # Validación básica del token
+def _validate_token(token):
+    """Validación básica del token; devuelve False si el usuario decide no guardarlo"""
     if len(token) < 30 or ':' not in token:
         click.echo("❌ El token parece inválido. Debe tener el formato '123456789:ABCdefGHIjkl...'", err=True)
-        if not click.confirm("¿Desea guardarlo de todos modos?"):
+        return click.confirm("¿Desea guardarlo de todos modos?")
+    return True
+
+# Comandos set-*: (comando, opción, clave .env, prompt, ocultar entrada, etiqueta, validador, ayuda)
+SETTERS = [
+    ('set-telegram-token', 'token', 'TELEGRAM_BOT_TOKEN', 'Bot Token de Telegram',
+     True, 'Token', _validate_token, 'Configura el Bot Token de Telegram'),
+    ('set-telegram-chat', 'chat', 'TELEGRAM_CHAT_ID', 'Chat ID de Telegram',
+     False, 'Chat ID', None, 'Configura el Chat ID de Telegram'),
+]
+
+def _make_setter(env_key, label, validator):
+    """Crea el cuerpo de un comando que guarda un único valor en el .env"""
+    def setter(value):
+        from dotenv import set_key
+        if not verify_env_file():
+            sys.exit(1)
+        
+        if validator and not validator(value):
             return
+        
+        saved, _, _ = set_key(str(ENV_PATH), env_key, value)
+        _invalidate_config()
+        if saved:
+            click.echo(f"✅ {label} guardado en {ENV_PATH}")
+        else:
+            click.echo(f"❌ Error: {label} no se guardó correctamente", err=True)
+    return setter
+
+for _name, _option, _env_key, _prompt, _hidden, _label, _validator, _help in SETTERS:
+    cli.command(name=_name, help=_help)(
+        click.option(f'--{_option}', 'value', prompt=_prompt, hide_input=_hidden)(
+            _make_setter(_env_key, _label, _validator)
+        )
+    )
+
+@cli.command('whitelist-batch')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+def whitelist_batch(path):
+    """Añade a la lista blanca las MACs/IPs de un archivo (una por línea)"""
+    from inventory import FileInventory
     
-    set_key(str(ENV_PATH), 'TELEGRAM_BOT_TOKEN', token)
-    click.echo(f"✅ Token guardado en {ENV_PATH}")
+    identifiers = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                identifiers.append(line)
     
-    # Verificar que se guardó correctamente
-    load_dotenv(dotenv_path=ENV_PATH, override=True)
-    if os.getenv('TELEGRAM_BOT_TOKEN') == token:
-        click.echo("✓ Verificación: Token guardado correctamente")
-    else:
-        click.echo("❌ Error: El token no se guardó correctamente", err=True)
-
-@cli.command()
-@click.option('--chat', prompt='Chat ID de Telegram')
-def set_telegram_chat(chat):
-    """Configura el Chat ID de Telegram"""
-    if not verify_env_file():
+    try:
+        with FileInventory(BASE_DIR / "data") as inventory:
+            added, existing = inventory.whitelist_devices(identifiers)
+    except ValueError as e:
+        click.echo(f"❌ {str(e)}", err=True)
         sys.exit(1)
     
-    set_key(str(ENV_PATH), 'TELEGRAM_CHAT_ID', chat)
-    click.echo(f"✅ Chat ID guardado en {ENV_PATH}")
+    click.echo(f"✅ {added} entradas nuevas añadidas a la lista blanca "
+               f"({existing} ya existentes)")
 
 @cli.command()
-def verify():
+@click.option('--remote/--no-remote', default=False,
+              help='Probar también la conexión con la API de Telegram')
+def verify(remote):
     """Verifica profundamente la configuración"""
     if not verify_env_file():
         sys.exit(1)
     
     # Mostrar contenido crudo del archivo
     click.echo("\n📄 Contenido de .env:")
-    click.echo(ENV_PATH.read_text(encoding='utf-8'))
+    click.echo(_env_text())
+    
+    if not remote:
+        click.echo("ℹ️ Use --remote para probar la conexión con Telegram")
+        return
     
     # Verificar conexión con Telegram
-    load_dotenv(dotenv_path=ENV_PATH, override=True)
-    token = os.getenv('TELEGRAM_BOT_TOKEN')
-    chat_id = os.getenv('TELEGRAM_CHAT_ID')
+    config = _current_config()
+    token = config.get('TELEGRAM_BOT_TOKEN')
+    chat_id = config.get('TELEGRAM_CHAT_ID')
     
     if token and chat_id:
         click.echo("\n🔍 Probando conexión con Telegram...")
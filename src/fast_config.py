@@ -0,0 +1,46 @@
+import re
+from typing import Dict
+
+# Expresiones compiladas una sola vez al importar el módulo
+_LINE_RE = re.compile(r'^\s*(?:export\s+)?([A-Za-z_][A-Za-z0-9_.]*)\s*=\s*(.*?)\s*$')
+_DOUBLE_QUOTED_RE = re.compile(r'"((?:[^"\\]|\\.)*)"')
+_SINGLE_QUOTED_RE = re.compile(r"'((?:[^'\\]|\\.)*)'")
+_INLINE_COMMENT_RE = re.compile(r'\s+#')
+_ESCAPE_RE = re.compile(r'\\(.)')
+_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r'}
+_SINGLE_QUOTE_ESCAPE_RE = re.compile(r"\\([\\'])")
+
+
+def _unquote(value: str) -> str:
+    """Interpreta comillas, secuencias de escape y comentarios en línea"""
+    if value.startswith('"'):
+        match = _DOUBLE_QUOTED_RE.match(value)
+        if match:
+            return _ESCAPE_RE.sub(lambda m: _ESCAPES.get(m.group(1), m.group(1)),
+                                  match.group(1))
+    elif value.startswith("'"):
+        match = _SINGLE_QUOTED_RE.match(value)
+        if match:
+            return _SINGLE_QUOTE_ESCAPE_RE.sub(r'\1', match.group(1))
+    return _INLINE_COMMENT_RE.split(value, 1)[0]
+
+
+def parse(text: str) -> Dict[str, str]:
+    """
+    Parsea el contenido de un archivo .env (CLAVE=valor) sin dependencias externas.
+    
+    Args:
+        text: Contenido del archivo
+        
+    Returns:
+        Diccionario con las claves y sus valores
+    """
+    config = {}
+    for line in text.splitlines():
+        if not line.strip() or line.lstrip().startswith('#'):
+            continue
+        match = _LINE_RE.match(line)
+        if match:
+            key, value = match.groups()
+            config[key] = _unquote(value)
+    return config
@@ -1,13 +1,133 @@
+import atexit
+import contextlib
 import csv
+import fcntl
+import functools
 import re
 import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+import weakref
+from collections import namedtuple
 from pathlib import Path
-from datetime import datetime
 import ipaddress
-from typing import List, Dict, Optional
+from typing import FrozenSet, Iterable, Iterator, List, Dict, Optional, Set, Tuple, Union
+
+# Directorio de datos del proyecto, independiente del directorio de trabajo
+DEFAULT_DATA_DIR = Path(__file__).parent.parent / 'data'
+
+# Expresiones compiladas una sola vez al importar el módulo
+_MAC_RE = re.compile(r'^([0-9a-f]{2}[:-]){5}[0-9a-f]{2}$', re.I)
+_MAC_HEX_RE = re.compile(r'[0-9a-f]{12}')
+# Separadores habituales en MACs (00:11.., 00-11.., 0011.2233.., espacios)
+_MAC_TRANS = str.maketrans('', '', ':-. _\u00a0')
+
+@functools.lru_cache(maxsize=256)
+def parse_network(network: str):
+    """Parsea una red CIDR reutilizando el resultado (ValueError si no es válida)"""
+    return ipaddress.ip_network(network, strict=False)
+
+@functools.lru_cache(maxsize=256)
+def _network_mask(network: str) -> Tuple[int, int, int]:
+    """Red CIDR como (familia, red entera, máscara entera); ValueError si no es válida"""
+    net = parse_network(network)
+    family = socket.AF_INET if net.version == 4 else socket.AF_INET6
+    return family, int(net.network_address), int(net.netmask)
+
+@functools.lru_cache(maxsize=8192)
+def _normalize_mac(mac: str) -> str:
+    """Implementación de FileInventory.normalize_mac, memorizada por MAC"""
+    mac = mac.strip().lower()
+    if _MAC_RE.match(mac):
+        return mac.replace('-', ':')
+    
+    # Eliminar separadores y exigir 12 dígitos hexadecimales
+    mac = mac.translate(_MAC_TRANS)
+    if not _MAC_HEX_RE.fullmatch(mac):
+        return ''
+        
+    # Formatear con dos puntos cada dos caracteres
+    return f"{mac[0:2]}:{mac[2:4]}:{mac[4:6]}:{mac[6:8]}:{mac[8:10]}:{mac[10:12]}"
+
+@functools.lru_cache(maxsize=32)
+def _prefix_tables(networks: Tuple[str, ...]) -> Dict[int, List[Tuple[int, FrozenSet[int]]]]:
+    """
+    Agrupa redes CIDR por versión y máscara: {versión: [(máscara, {redes})]}.
+    Así una IP se comprueba con una operación por longitud de prefijo,
+    sin importar cuántas redes haya. Las redes inválidas se ignoran.
+    """
+    groups: Dict[int, Dict[int, Set[int]]] = {}
+    for network in networks:
+        try:
+            net = parse_network(network)
+        except ValueError:
+            continue
+        groups.setdefault(net.version, {}).setdefault(
+            int(net.netmask), set()).add(int(net.network_address))
+    return {version: [(mask, frozenset(nets)) for mask, nets in by_mask.items()]
+            for version, by_mask in groups.items()}
+
+def _packed_ip(ip: str) -> bytes:
+    """IP en formato binario (4 o 16 bytes); ValueError si no es válida"""
+    try:
+        if ':' in ip:
+            return ipaddress.ip_address(ip).packed
+        return socket.inet_pton(socket.AF_INET, ip)
+    except OSError:
+        raise ValueError(f"IP inválida: {ip}")
+
+# Inventarios con devices.csv abierto; un único hook de salida los cierra sin
+# mantener vivas las instancias (una referencia fuerte por instancia lo haría)
+_open_inventories: 'weakref.WeakSet[FileInventory]' = weakref.WeakSet()
+
+@atexit.register
+def _close_inventories() -> None:
+    """Vacía y cierra los inventarios aún abiertos al terminar el intérprete"""
+    for inventory in list(_open_inventories):
+        inventory.close()
+
+# Buffer de lectura de devices.csv: menos llamadas read() en inventarios grandes
+_READ_BUFFER = 1 << 20
+
+# (segundo, fecha y hora sin fracción) cacheados para el segundo en curso; la
+# tupla se sustituye en una sola asignación, así ningún hilo mezcla valores
+_ts_cache: Tuple[Optional[int], str] = (None, '')
+
+def _timestamp() -> str:
+    """Marca de tiempo local ISO 8601, formateando la fecha solo una vez por segundo"""
+    global _ts_cache
+    now = time.time()
+    second = int(now)
+    cached_second, prefix = _ts_cache
+    if second != cached_second:
+        prefix = time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(second))
+        _ts_cache = (second, prefix)
+    return f"{prefix}.{int((now - second) * 1000000):06d}"
+
+# Fila de devices.csv: tupla con nombres de campo compartidos por la clase
+DeviceRecord = namedtuple('DeviceRecord', ['mac', 'ip', 'name', 'os', 'vendor',
+                                           'status', 'first_seen', 'last_seen'])
+
+# Dispositivo detectado por el escáner (mismo orden que add_device)
+Device = namedtuple('Device', ['mac', 'ip', 'vendor', 'os_info', 'name'],
+                    defaults=('Desconocido', 'unknown', ''))
+
+def _to_record(row: List[str]) -> DeviceRecord:
+    """Convierte una fila del CSV en DeviceRecord, completando columnas ausentes"""
+    if len(row) != len(DeviceRecord._fields):
+        row = (row + [''] * len(DeviceRecord._fields))[:len(DeviceRecord._fields)]
+    return DeviceRecord._make(row)
 
 class FileInventory:
-    def __init__(self, data_dir: str = '../data') -> None:
+    # Columnas de devices.csv y sus posiciones
+    COLUMNS = DeviceRecord._fields
+    (COL_MAC, COL_IP, COL_NAME, COL_OS, COL_VENDOR,
+     COL_STATUS, COL_FIRST_SEEN, COL_LAST_SEEN) = range(8)
+
+    def __init__(self, data_dir: Union[str, Path] = DEFAULT_DATA_DIR) -> None:
         """
         Inicializa el sistema de inventario con manejo seguro de direcciones IP.
         
@@ -15,6 +135,8 @@ class FileInventory:
             data_dir: Directorio donde se almacenan los archivos de datos
         """
         self.data_dir = Path(data_dir)
+        self._tick_ts: Optional[str] = None  # Marca de tiempo del escaneo en curso
+        self._lock = threading.RLock()  # Serializa escrituras entre hilos
         self._initialize_files()
 
     def _initialize_files(self):
@@ -22,13 +144,12 @@ class FileInventory:
         self.data_dir.mkdir(exist_ok=True)
         self.devices_file = self.data_dir / 'devices.csv'
         
-        if not self.devices_file.exists():
-            with open(self.devices_file, 'w', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow([
-                    'mac', 'ip', 'name', 'os', 'vendor',
-                    'status', 'first_seen', 'last_seen'
-                ])
+        # Un único listado del directorio en lugar de un stat por archivo
+        with os.scandir(self.data_dir) as entries:
+            existing = {entry.name for entry in entries}
+        
+        if self.devices_file.name not in existing:
+            self._create_devices_file()
         
         # Archivos de listas de control
         self.whitelist_file = self.data_dir / 'whitelist.txt'
@@ -37,11 +158,169 @@ class FileInventory:
         
         for f in [self.whitelist_file, self.ip_whitelist_file,
                  self.blacklist_file]:
-            f.touch(exist_ok=True)
+            if f.name not in existing:
+                f.touch(exist_ok=True)
+        
+        self._devices_by_mac = None  # Índice MAC -> fila, cargado bajo demanda
+        self._known_ips = set()
+        self._list_cache: Dict[Path, Tuple[int, FrozenSet[str]]] = {}
+        # (mtime, IPs empaquetadas) de ip_whitelist.txt
+        self._ip_packed_cache: Optional[Tuple[int, FrozenSet[bytes]]] = None
+        
+        # Manejador persistente para añadir dispositivos sin reabrir el CSV
+        self._open_writer()
+        _open_inventories.add(self)
+
+    def _create_devices_file(self) -> None:
+        """Crea devices.csv con su cabecera si no existe"""
+        # 'x' crea y escribe la cabecera en una sola apertura, sin truncar
+        # el archivo si otro proceso lo acaba de crear
+        try:
+            with open(self.devices_file, 'x', newline='') as f:
+                csv.writer(f).writerow(self.COLUMNS)
+        except FileExistsError:
+            pass
+
+    def _open_writer(self) -> None:
+        """Abre el manejador de escritura en modo append sobre devices.csv"""
+        self._devices_fh = open(self.devices_file, 'a', newline='', buffering=131072)
+        self._devices_writer = csv.writer(self._devices_fh)
+        self._devices_ino = os.fstat(self._devices_fh.fileno()).st_ino
+
+    def _check_devices_file(self) -> None:
+        """
+        Reabre devices.csv si se ha borrado o sustituido (limpieza de data/
+        con el demonio en marcha): de lo contrario se seguiría escribiendo en
+        el archivo desvinculado y el índice en memoria daría por conocidos
+        dispositivos ya eliminados. Se llama con self._lock tomado.
+        """
+        try:
+            if os.stat(self.devices_file).st_ino == self._devices_ino:
+                return
+        except FileNotFoundError:
+            self.data_dir.mkdir(exist_ok=True)
+            self._create_devices_file()
+        
+        logging.info("devices.csv sustituido; se recarga el inventario")
+        self.close()
+        self._open_writer()
+        self._devices_by_mac = None
+
+    def begin_scan(self) -> None:
+        """Fija una única marca de tiempo para todos los registros del escaneo"""
+        self._tick_ts = _timestamp()
+
+    def end_scan(self) -> None:
+        """Vuelve a usar la hora actual en cada registro"""
+        self._tick_ts = None
+
+    def _now(self) -> str:
+        """Marca de tiempo del escaneo en curso o, fuera de él, la hora actual"""
+        return self._tick_ts or _timestamp()
+
+    def flush(self) -> None:
+        """Escribe en disco los dispositivos pendientes en el buffer"""
+        with self._lock:
+            if not self._devices_fh.closed:
+                self._devices_fh.flush()
+
+    def close(self) -> None:
+        """Vacía el buffer y cierra el archivo de dispositivos"""
+        with self._lock:
+            if not self._devices_fh.closed:
+                self._devices_fh.close()
+
+    def __enter__(self) -> 'FileInventory':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def _ensure_index(self) -> Dict[str, DeviceRecord]:
+        """
+        Carga en memoria, con una sola lectura del CSV, el índice de dispositivos.
+        
+        Returns:
+            Diccionario MAC (minúsculas) -> datos del dispositivo
+        """
+        if self._devices_by_mac is None:
+            self._devices_by_mac = {}
+            self._known_ips = set()
+            for row in self.iter_devices():
+                device = _to_record(row)
+                self._devices_by_mac[device.mac.lower()] = device
+                self._known_ips.add(device.ip)
+        return self._devices_by_mac
+
+    def reload(self) -> None:
+        """Fuerza la relectura de las listas de control en el próximo acceso"""
+        self._list_cache.clear()
+        self._ip_packed_cache = None
+
+    def _load_set(self, list_file: Path, lower: bool = False) -> FrozenSet[str]:
+        """
+        Devuelve el contenido de una lista de control, releyendo el archivo
+        solo cuando su fecha de modificación ha cambiado.
+        
+        Args:
+            list_file: Archivo de lista
+            lower: Normalizar las entradas a minúsculas (MACs)
+            
+        Returns:
+            Conjunto inmutable con las entradas de la lista
+        """
+        mtime_ns = list_file.stat().st_mtime_ns
+        cached = self._list_cache.get(list_file)
+        if cached and cached[0] == mtime_ns:
+            return cached[1]
+        
+        entries = frozenset(self._read_list(list_file, lower))
+        self._list_cache[list_file] = (mtime_ns, entries)
+        return entries
+
+    def _load_ip_set(self) -> FrozenSet[bytes]:
+        """
+        Devuelve la lista blanca de IPs en formato binario, de modo que
+        distintas escrituras de la misma IP coincidan y la comparación no
+        dependa del texto. Se recalcula solo si el archivo ha cambiado.
+        
+        Returns:
+            Conjunto inmutable con las IPs empaquetadas
+        """
+        mtime_ns = self.ip_whitelist_file.stat().st_mtime_ns
+        cached = self._ip_packed_cache
+        if cached and cached[0] == mtime_ns:
+            return cached[1]
+        
+        packed = set()
+        for ip in self._load_set(self.ip_whitelist_file):
+            try:
+                packed.add(_packed_ip(ip))
+            except ValueError:
+                logging.warning("IP inválida en lista blanca: %s", ip)
+        entries = frozenset(packed)
+        self._ip_packed_cache = (mtime_ns, entries)
+        return entries
+
+    def _read_list(self, list_file: Path, lower: bool = False) -> Set[str]:
+        """
+        Lee un archivo de lista de control como conjunto.
+        
+        Args:
+            list_file: Archivo de lista a leer
+            lower: Normalizar las entradas a minúsculas (MACs)
+            
+        Returns:
+            Conjunto con las entradas no vacías del archivo
+        """
+        with open(list_file, 'r') as f:
+            items = {line.strip() for line in f if line.strip()}
+        return {item.lower() for item in items} if lower else items
 
     def validate_ip(self, ip_str: str) -> bool:
         """
-        Valida una dirección IP usando el módulo ipaddress.
+        Valida una dirección IP. Las IPv4 se comprueban con socket.inet_pton
+        (estricto, sin crear objetos); las IPv6 con el módulo ipaddress.
         
         Args:
             ip_str: Dirección IP a validar
@@ -50,9 +329,12 @@ class FileInventory:
             bool: True si es una IP válida, False en caso contrario
         """
         try:
-            ipaddress.ip_address(ip_str)
+            if ':' in ip_str:
+                ipaddress.ip_address(ip_str)
+            else:
+                socket.inet_pton(socket.AF_INET, ip_str)
             return True
-        except ValueError:
+        except (OSError, ValueError):
             return False
 
     def is_ip_in_any_network(self, ip_str: str, networks: List[str]) -> bool:
@@ -67,17 +349,16 @@ class FileInventory:
             bool: True si la IP está en alguna de las redes
         """
         try:
-            ip = ipaddress.ip_address(ip_str)
-            for network_str in networks:
-                try:
-                    network = ipaddress.ip_network(network_str, strict=False)
-                    if ip in network:
-                        return True
-                except ValueError:
-                    continue
-            return False
+            packed = _packed_ip(ip_str)
         except ValueError:
             return False
+        
+        ip_int = int.from_bytes(packed, 'big')
+        version = 4 if len(packed) == 4 else 6
+        for mask, nets in _prefix_tables(tuple(networks)).get(version, ()):
+            if (ip_int & mask) in nets:
+                return True
+        return False
 
     def add_device(self, mac: str, ip: str, vendor: str, 
                 os_info: str = 'unknown', name: str = '') -> None:
@@ -86,84 +367,115 @@ class FileInventory:
             # Para dispositivos remotos sin MAC, usamos IP como identificador único
             device_id = ip if mac == '00:00:00:00:00:00' else mac
             
-            # Validar IP
-            if not self.validate_ip(ip):
-                logging.warning(f"IP inválida: {ip}")
+            row = self._build_row(mac, ip, vendor, os_info, name, self._now())
+            if row is None:
                 return
-                
-            status = self._determine_status(mac, ip)
-            now = datetime.now().isoformat()
             
-            # Bloqueo para escritura segura
-            with open(self.devices_file, 'a', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow([
-                    mac, ip, name, os_info, vendor,
-                    status, now, now
-                ])
-                
-            logging.debug(f"Dispositivo añadido: {ip} ({mac})")
+            with self._lock:
+                self._check_devices_file()
+                self._devices_writer.writerow(row)
+                self._index_row(row)
+            logging.debug("Dispositivo añadido: %s (%s)", ip, mac)
             
         except Exception as e:
-            logging.error(f"Error añadiendo dispositivo {ip}: {str(e)}")
+            logging.error("Error añadiendo dispositivo %s: %s", ip, e)
             raise
 
+    def add_devices(self, devices: Iterable[Device]) -> List[Device]:
+        """
+        Añade varios dispositivos con una sola escritura (writerows).
+        
+        Args:
+            devices: Dispositivos detectados por el escáner
+            
+        Returns:
+            Los dispositivos de entrada que se han añadido (IP válida)
+        """
+        now = self._now()
+        rows = []
+        added = []
+        for device in devices:
+            row = self._build_row(device.mac, device.ip, device.vendor,
+                                  device.os_info, device.name, now)
+            if row is not None:
+                rows.append(row)
+                added.append(device)
+        
+        with self._lock:
+            self._check_devices_file()
+            self._devices_writer.writerows(rows)
+            for row in rows:
+                self._index_row(row)
+        logging.debug("%d dispositivos añadidos", len(rows))
+        return added
+
+    def _build_row(self, mac: str, ip: str, vendor: str, os_info: str,
+                   name: str, now: str) -> Optional[List[str]]:
+        """Construye la fila de devices.csv, o None si la IP no es válida"""
+        if not self.validate_ip(ip):
+            logging.warning("IP inválida: %s", ip)
+            return None
+        # Guardar la MAC ya canónica para no normalizarla en cada consulta
+        mac = self.normalize_mac(mac) or mac.lower()
+        status = self._determine_status(mac, ip)
+        return [mac, ip, name, os_info, vendor, status, now, now]
+
+    def _index_row(self, row: List[str]) -> None:
+        """Registra una fila recién escrita en el índice en memoria"""
+        self._ensure_index()[row[self.COL_MAC]] = DeviceRecord._make(row)
+        self._known_ips.add(row[self.COL_IP])
+
     def device_exists(self, identifier: str) -> bool:
-        """Verifica si un dispositivo existe por MAC o IP"""
-        if not self.devices_file.exists():
-            return False
+        """
+        Verifica si un dispositivo existe en el inventario por MAC o IP.
+        
+        Args:
+            identifier: Dirección MAC o IP a buscar
             
-        try:
-            with open(self.devices_file, 'r') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    if row['mac'] == identifier or row['ip'] == identifier:
-                        return True
-            return False
-        except Exception as e:
-            logging.error(f"Error verificando dispositivo: {str(e)}")
-            return False
-            """
-            Verifica si un dispositivo existe en el inventario por su MAC.
+        Returns:
+            bool: True si el dispositivo existe
+        """
+        with self._lock:
+            self._check_devices_file()
+            return identifier.lower() in self._ensure_index() or identifier in self._known_ips
+
+    def unknown_ids(self, identifiers: Iterable[str]) -> Set[str]:
+        """
+        Comprueba varios dispositivos con una sola toma del bloqueo, buscando
+        cada uno en el índice (sin copiarlo) como haría device_exists.
+        
+        Args:
+            identifiers: Direcciones MAC o IP a buscar
             
-            Args:
-                mac: Dirección MAC a buscar
-                
-            Returns:
-                bool: True si el dispositivo existe
-            """
-            with open(self.devices_file, 'r') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    if row['mac'].lower() == mac.lower():
-                        return True
-            return False
+        Returns:
+            Set[str]: Los identificadores, tal como se recibieron, que no
+            están en el inventario
+        """
+        with self._lock:
+            self._check_devices_file()
+            index = self._ensure_index()
+            return {identifier for identifier in identifiers
+                    if identifier.lower() not in index and identifier not in self._known_ips}
 
     def _determine_status(self, mac: str, ip: str) -> str:
         """
         Determina el estado de un dispositivo basado en las listas de control.
         
         Args:
-            mac: Dirección MAC del dispositivo
+            mac: Dirección MAC del dispositivo, ya normalizada
             ip: Dirección IP del dispositivo
             
         Returns:
             str: Estado del dispositivo ('authorized', 'blocked', 'unknown')
         """
-        # Verificar MAC en whitelist
-        with open(self.whitelist_file, 'r') as f:
-            if mac.lower() in [line.strip().lower() for line in f if line.strip()]:
-                return 'authorized'
-        
-        # Verificar IP en whitelist
-        with open(self.ip_whitelist_file, 'r') as f:
-            if ip in [line.strip() for line in f if line.strip()]:
-                return 'authorized'
+        # Verificar blacklist primero: el bloqueo prevalece sobre la whitelist
+        if mac in self._load_set(self.blacklist_file, lower=True):
+            return 'blocked'
         
-        # Verificar blacklist
-        with open(self.blacklist_file, 'r') as f:
-            if mac.lower() in [line.strip().lower() for line in f if line.strip()]:
-                return 'blocked'
+        # Verificar MAC o IP en whitelist
+        if (mac in self._load_set(self.whitelist_file, lower=True)
+                or _packed_ip(ip) in self._load_ip_set()):
+            return 'authorized'
         
         return 'unknown'
 
@@ -177,12 +489,39 @@ class FileInventory:
         Raises:
             ValueError: Si el identificador no es MAC ni IP válida
         """
-        if ':' in identifier or '-' in identifier:  # Es MAC
-            self._update_list(identifier, self.whitelist_file)
-        elif self.validate_ip(identifier):  # Es IP
-            self._update_list(identifier, self.ip_whitelist_file)
-        else:
-            raise ValueError("Identificador debe ser MAC (00:11:22:33:44:55) o IP válida")
+        self.whitelist_devices([identifier])
+
+    def whitelist_devices(self, identifiers: Iterable[str]) -> Tuple[int, int]:
+        """
+        Añade varios dispositivos (MAC o IP) a la lista blanca con una
+        sola escritura por archivo. No se escribe nada si alguno es inválido.
+        
+        Args:
+            identifiers: Direcciones MAC o IP a añadir
+            
+        Returns:
+            Tuple[int, int]: Entradas nuevas añadidas y entradas que ya estaban
+            en la lista (los repetidos dentro del lote cuentan una sola vez)
+            
+        Raises:
+            ValueError: Si algún identificador no es MAC ni IP válida
+        """
+        # Diccionarios como conjuntos ordenados: repetidos normalizados fuera
+        macs, ips = {}, {}
+        for identifier in identifiers:
+            identifier = identifier.strip()
+            if _MAC_RE.match(identifier):  # Es MAC
+                macs[self.normalize_mac(identifier).lower()] = None
+            elif self.validate_ip(identifier):  # Es IP
+                ips[identifier] = None
+            else:
+                raise ValueError(
+                    f"Identificador debe ser MAC (00:11:22:33:44:55) o IP válida: {identifier}"
+                )
+        
+        added = (self._update_list(macs, self.whitelist_file, lower=True)
+                 + self._update_list(ips, self.ip_whitelist_file))
+        return added, len(macs) + len(ips) - added
 
     def blacklist_device(self, mac: str) -> None:
         """
@@ -191,44 +530,116 @@ class FileInventory:
         Args:
             mac: Dirección MAC a bloquear
         """
-        self._update_list(mac, self.blacklist_file)
+        self._update_list([self.normalize_mac(mac) or mac], self.blacklist_file, lower=True)
 
-    def _update_list(self, identifier: str, list_file: Path) -> None:
+    def _update_list(self, identifiers: Iterable[str], list_file: Path,
+                     lower: bool = False) -> int:
         """
         Actualiza un archivo de lista (whitelist/blacklist).
         
         Args:
-            identifier: Identificador a añadir (MAC o IP)
+            identifiers: Identificadores a añadir (MAC o IP)
             list_file: Archivo de lista a actualizar
+            lower: Comparar sin distinguir mayúsculas (MACs)
+            
+        Returns:
+            int: Número de entradas nuevas añadidas
         """
-        identifier = identifier.strip()
-        existing = set()
+        with self._lock, self._open_locked(list_file) as f:
+            # Comprobar bajo el bloqueo: otro proceso pudo añadir entradas
+            entries = self._load_set(list_file, lower)
+            new_keys = set()
+            new_lines = []
+            for identifier in identifiers:
+                identifier = identifier.strip()
+                key = identifier.lower() if lower else identifier
+                
+                # Añadir si no existe
+                if key not in entries and key not in new_keys:
+                    new_keys.add(key)
+                    new_lines.append(f"{key}\n")
+            
+            if new_lines:
+                f.writelines(new_lines)
+                f.flush()
+                # Mantener la caché al día sin volver a leer el archivo
+                self._list_cache[list_file] = (list_file.stat().st_mtime_ns, entries | new_keys)
+        return len(new_lines)
+
+    def _open_locked(self, list_file: Path):
+        """
+        Abre una lista en modo append con bloqueo exclusivo (flock). Si el
+        archivo fue sustituido mientras se esperaba el bloqueo, lo reabre.
         
-        # Leer existentes
-        if list_file.exists():
-            with open(list_file, 'r') as f:
-                existing = {line.strip() for line in f if line.strip()}
+        Args:
+            list_file: Archivo de lista a bloquear
+            
+        Returns:
+            Archivo abierto; el bloqueo se libera al cerrarlo
+        """
+        while True:
+            f = open(list_file, 'a')
+            fcntl.flock(f, fcntl.LOCK_EX)
+            if os.fstat(f.fileno()).st_ino == os.stat(list_file).st_ino:
+                return f
+            f.close()
+
+    @contextlib.contextmanager
+    def _atomic_write(self, target: Path, **open_kwargs):
+        """
+        Escribe en un temporal único del directorio de datos y lo sustituye
+        por el destino con os.replace al terminar. Si hay un error, el
+        temporal se borra y el destino queda intacto.
         
-        # Añadir si no existe
-        if identifier not in existing:
-            with open(list_file, 'a') as f:
-                f.write(f"{identifier}\n")
+        Args:
+            target: Archivo a sustituir
+            open_kwargs: Opciones adicionales de apertura (newline, buffering)
+            
+        Yields:
+            Archivo temporal abierto en modo escritura
+        """
+        tmp = tempfile.NamedTemporaryFile('w', dir=self.data_dir, prefix=f'.{target.name}.',
+                                          suffix='.tmp', delete=False, **open_kwargs)
+        try:
+            with tmp:
+                yield tmp
+            # Conservar los permisos del original (el temporal se crea con 0600)
+            with contextlib.suppress(FileNotFoundError):
+                os.chmod(tmp.name, os.stat(target).st_mode & 0o7777)
+            os.replace(tmp.name, target)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(tmp.name)
+            raise
 
-    def get_all_devices(self) -> List[Dict[str, str]]:
+    def _rewrite_list(self, list_file: Path, items: Iterable[str]) -> None:
+        """Sustituye atómicamente el contenido de una lista"""
+        with self._atomic_write(list_file) as f:
+            f.writelines(f"{item}\n" for item in items)
+
+    def get_all_devices(self) -> List[DeviceRecord]:
         """
         Obtiene todos los dispositivos del inventario.
         
         Returns:
-            Lista de diccionarios con información de dispositivos
+            Lista de DeviceRecord (usar ._asdict() si se necesita un diccionario)
         """
-        devices = []
-        with open(self.devices_file, 'r') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                devices.append(dict(row))
-        return devices
+        return [_to_record(row) for row in self.iter_devices()]
 
-    def get_network_devices(self, network: str) -> List[Dict[str, str]]:
+    def iter_devices(self) -> Iterator[List[str]]:
+        """
+        Recorre el inventario fila a fila sin construir diccionarios.
+        
+        Yields:
+            Lista de campos de cada dispositivo (posiciones COL_*)
+        """
+        self.flush()
+        with open(self.devices_file, 'r', newline='', buffering=_READ_BUFFER) as f:
+            reader = csv.reader(f)
+            next(reader, None)  # Cabecera
+            yield from reader
+
+    def get_network_devices(self, network: str) -> List[DeviceRecord]:
         """
         Obtiene dispositivos que pertenecen a una red específica.
         
@@ -239,20 +650,19 @@ class FileInventory:
             Lista de dispositivos en esa red
         """
         try:
-            target_net = ipaddress.ip_network(network, strict=False)
+            family, net_int, mask = _network_mask(network)
         except ValueError:
             return []
-            
+        
         devices = []
-        with open(self.devices_file, 'r') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                try:
-                    ip = ipaddress.ip_address(row['ip'])
-                    if ip in target_net:
-                        devices.append(dict(row))
-                except ValueError:
-                    continue
+        # Comparar como enteros: (ip & máscara) == red, sin objetos por fila
+        for row in self.iter_devices():
+            try:
+                ip_int = int.from_bytes(socket.inet_pton(family, row[self.COL_IP]), 'big')
+            except (OSError, ValueError):
+                continue
+            if ip_int & mask == net_int:
+                devices.append(_to_record(row))
         return devices
 
     def normalize_mac(self, mac: str) -> str:
@@ -265,53 +675,44 @@ class FileInventory:
         Returns:
             str: MAC normalizada o cadena vacía si no es válida
         """
-        mac = mac.strip().lower()
-        # Eliminar separadores no alfanuméricos
-        mac = ''.join(c for c in mac if c.isalnum())
-        
-        if len(mac) != 12:
-            return ''
-            
-        # Formatear con dos puntos cada dos caracteres
-        return ':'.join(mac[i:i+2] for i in range(0, 12, 2))
+        return _normalize_mac(mac)
 
     def cleanup_data(self) -> None:
         """Limpia y normaliza todos los datos en los archivos"""
-        # Normalizar MACs en devices.csv
-        devices = []
-        with open(self.devices_file, 'r') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                row['mac'] = self.normalize_mac(row['mac']) or row['mac']
-                devices.append(row)
-        
-        # Reescribir archivo
-        with open(self.devices_file, 'w', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=devices[0].keys())
-            writer.writeheader()
-            writer.writerows(devices)
-        
-        # Normalizar archivos de listas
-        for list_file in [self.whitelist_file, self.blacklist_file]:
-            items = set()
-            if list_file.exists():
-                with open(list_file, 'r') as f:
-                    items = {self.normalize_mac(line.strip()) or line.strip() 
-                            for line in f if line.strip()}
-            
-            with open(list_file, 'w') as f:
-                for item in sorted(items):
-                    f.write(f"{item}\n")
-        
-        # Normalizar ip_whitelist.txt
-        ips = set()
-        if self.ip_whitelist_file.exists():
-            with open(self.ip_whitelist_file, 'r') as f:
-                for line in f:
-                    ip = line.strip()
-                    if self.validate_ip(ip):
-                        ips.add(ip)
-            
-            with open(self.ip_whitelist_file, 'w') as f:
-                for ip in sorted(ips, key=lambda x: ipaddress.ip_address(x)):
-                    f.write(f"{ip}\n")
\ No newline at end of file
+        with self._lock:
+            # Normalizar MACs en devices.csv en una sola pasada sobre un temporal
+            self.close()
+            try:
+                with open(self.devices_file, 'r', newline='', buffering=_READ_BUFFER) as fi, \
+                        self._atomic_write(self.devices_file, newline='',
+                                           buffering=_READ_BUFFER) as fo:
+                    reader = csv.reader(fi)
+                    writer = csv.writer(fo)
+                    header = next(reader, None) or list(self.COLUMNS)
+                    writer.writerow(header)
+                    mac_idx = header.index('mac') if 'mac' in header else self.COL_MAC
+                    for row in reader:
+                        row[mac_idx] = self.normalize_mac(row[mac_idx]) or row[mac_idx]
+                        writer.writerow(row)
+            finally:
+                # El manejador anterior apunta al archivo sustituido
+                self._open_writer()
+            self._devices_by_mac = None
+        
+            # Normalizar archivos de listas (bloqueadas durante la reescritura)
+            for list_file in [self.whitelist_file, self.blacklist_file]:
+                with self._open_locked(list_file):
+                    items = {self.normalize_mac(item) or item
+                             for item in self._read_list(list_file)}
+                    self._rewrite_list(list_file, sorted(items))
+        
+            # Normalizar ip_whitelist.txt
+            with self._open_locked(self.ip_whitelist_file):
+                ips = {ip for ip in self._read_list(self.ip_whitelist_file)
+                       if self.validate_ip(ip)}
+                # Ordenar por la IP empaquetada: primero IPv4 (4 bytes), luego IPv6
+                keyed = sorted((len(packed), packed, ip)
+                               for ip in ips for packed in (_packed_ip(ip),))
+                self._rewrite_list(self.ip_whitelist_file, [ip for _, _, ip in keyed])
+        
+            self.reload()
\ No newline at end of file
@@ -1,176 +1,305 @@
 #!/usr/bin/env python3
 import time
+import atexit
+import functools
+import ipaddress
 import logging
+import logging.handlers
 import os
+import queue
+import re
+import socket
 import sys
 import signal
-from datetime import datetime
+import threading
 from pathlib import Path
 from dotenv import load_dotenv
-from typing import List, Dict
+from typing import TYPE_CHECKING, List, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    # Solo para anotaciones: inventory se importa en el primer uso (ver abajo)
+    from inventory import Device
 
 # En netScanAlert.py, modifica la configuración de logging:
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
+# (solo si nadie lo ha hecho antes; evita abrir otro FileHandler al reimportar)
+# Los registros se encolan y un hilo aparte los escribe en archivo y consola,
+# así el bucle de escaneo no se bloquea en E/S de log.
+if not logging.getLogger().handlers:
+    _log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    _log_handlers = [
         logging.FileHandler('../log/netScanAlert.log'),  # Cambia esta línea
         logging.StreamHandler()
     ]
-)
+    for _handler in _log_handlers:
+        _handler.setFormatter(_log_formatter)
+    
+    _log_queue = queue.SimpleQueue()
+    _log_listener = logging.handlers.QueueListener(
+        _log_queue, *_log_handlers, respect_handler_level=True)
+    logging.getLogger().addHandler(logging.handlers.QueueHandler(_log_queue))
+    logging.getLogger().setLevel(logging.INFO)
+    _log_listener.start()
+    atexit.register(_log_listener.stop)
 
 BASE_DIR = Path(__file__).parent.parent
 ENV_PATH = BASE_DIR / "config" / ".env"
 load_dotenv(dotenv_path=ENV_PATH)
 
+# Máximo de escaneos (redes o lotes) a la vez; el escaneo espera E/S, no CPU
+MAX_SCAN_WORKERS = max(1, int(os.getenv('SCAN_WORKERS', '8')))
+
+# Red IPv4 en notación CIDR (a.b.c.d/nn)
+_CIDR_RE = re.compile(r'^(\d{1,3}(?:\.\d{1,3}){3})/(\d{1,2})$')
+
+# Línea de networks.txt: "[interfaz:]red [# comentario]"; las líneas vacías y
+# de comentario no coinciden. La separación interfaz/red la hace
+# _split_network_line
+_NETWORK_LINE_RE = re.compile(r'^[ \t]*([^#\s][^#\n]*?)[ \t]*(?:#.*)?$', re.MULTILINE)
+
+# Nombre de interfaz, con alias opcional (eth0:1)
+_INTERFACE_RE = re.compile(r'[\w.-]+(?::\w+)?')
+
+def _valid_network(network: str) -> bool:
+    """Valida una red CIDR; las IPv4 sin crear objetos ipaddress"""
+    match = _CIDR_RE.match(network)
+    if match:
+        try:
+            socket.inet_pton(socket.AF_INET, match.group(1))
+        except OSError:
+            return False
+        return int(match.group(2)) <= 32
+    
+    # IPv6 u otras notaciones aceptadas por ipaddress
+    try:
+        ipaddress.ip_network(network, strict=False)
+        return True
+    except ValueError:
+        return False
+
+def _split_network_line(spec: str) -> Optional[Tuple[str, str]]:
+    """
+    Separa "[interfaz:]red" probando cada ':' de izquierda a derecha: así
+    valen interfaces solo hexadecimales (cafe:10.0.0.0/24), alias
+    (eth0:1:10.0.0.0/24) y redes IPv6 con o sin interfaz. Una línea que ya
+    es una red válida (cafe:1::/64) se toma entera como red.
+    
+    Args:
+        spec: Línea sin comentario ni espacios en los extremos
+        
+    Returns:
+        (interfaz, red), con interfaz vacía si no se indica; None si no
+        contiene una red válida
+    """
+    if _valid_network(spec):
+        return '', spec
+    
+    colon = spec.find(':')
+    while colon != -1:
+        interface, network = spec[:colon].strip(), spec[colon + 1:].strip()
+        if _INTERFACE_RE.fullmatch(interface) and _valid_network(network):
+            return interface, network
+        colon = spec.find(':', colon + 1)
+    return None
+
+@functools.lru_cache(maxsize=4)
+def _parse_networks(path: str, mtime_ns: int) -> Tuple[Tuple[str, str], ...]:
+    """
+    Parsea networks.txt una sola vez por versión del archivo (ruta + mtime).
+    
+    Args:
+        path: Ruta de networks.txt
+        mtime_ns: Fecha de modificación, solo como clave de caché
+        
+    Returns:
+        Tuplas (interfaz, red) con redes CIDR válidas
+    """
+    configs = []
+    for spec in _NETWORK_LINE_RE.findall(Path(path).read_text()):
+        # Validar aquí: un error solo se registra cuando cambia el archivo
+        parsed = _split_network_line(spec)
+        if parsed is None:
+            logging.warning("Red inválida en networks.txt: %s", spec)
+            continue
+        interface, network = parsed
+        configs.append((interface or 'eth0', network))
+    return tuple(configs)
+
 class NetScanAlert:
     def __init__(self):
         """Inicializa el sistema de monitoreo"""
         self.running = False
+        self._stop_event = threading.Event()  # Despierta la espera al recibir una señal
         self.scan_interval = float(os.getenv('SCAN_INTERVAL', '100'))
         
         # Configurar manejo de señales
         signal.signal(signal.SIGINT, self._handle_signal)
         signal.signal(signal.SIGTERM, self._handle_signal)
-        
+
+    # Componentes creados (e importados) en su primer uso; sus módulos solo
+    # piden su logger y registran con la configuración de arriba
+    @functools.cached_property
+    def inventory(self):
         from inventory import FileInventory
+        return FileInventory()
+
+    @functools.cached_property
+    def scanner(self):
         from scanner import NetworkScanner
+        return NetworkScanner(self.inventory, max_parallel_scans=MAX_SCAN_WORKERS)
+
+    @functools.cached_property
+    def notifier(self):
         from notifier import TelegramNotifier
-        
-        self.inventory = FileInventory()
-        self.scanner = NetworkScanner(self.inventory)
-        self.notifier = TelegramNotifier()
+        return TelegramNotifier()
 
     def _handle_signal(self, signum, frame):
         """Maneja señales de terminación"""
         self.running = False
+        self._stop_event.set()
         logging.info("Recibida señal de terminación, finalizando...")
 
     def load_network_config(self) -> List[Dict]:
         """Carga configuración de redes"""
         networks_file = BASE_DIR / "config" / "networks.txt"
         
-        if not networks_file.exists():
+        try:
+            mtime_ns = networks_file.stat().st_mtime_ns
+        except FileNotFoundError:
             return [{'interface': 'eth0', 'network': '192.168.1.0/24'}]
         
         try:
-            with open(networks_file, 'r') as f:
-                configs = []
-                for line in f:
-                    line = line.strip()
-                    if not line or line.startswith('#'):
-                        continue
-                    
-                    if ':' in line:
-                        interface, network = line.split(':', 1)
-                        configs.append({
-                            'interface': interface.strip(),
-                            'network': network.strip()
-                        })
-                    else:
-                        configs.append({
-                            'interface': 'eth0',
-                            'network': line.strip()
-                        })
-                return configs
+            # networks.txt solo se vuelve a parsear si cambia su fecha de modificación
+            return [{'interface': interface, 'network': network}
+                    for interface, network in _parse_networks(str(networks_file), mtime_ns)]
         except Exception as e:
-            logging.error(f"Error leyendo networks.txt: {str(e)}")
+            logging.error("Error leyendo networks.txt: %s", e)
             return []
 
-    def scan_networks(self) -> List[Dict]:
+    def scan_networks(self) -> List['Device']:
         """Escanea todas las redes configuradas"""
         network_configs = self.load_network_config()
         all_devices = []
+        if not network_configs:
+            return all_devices
         
         for config in network_configs:
-            network = config['network']
-            interface = config['interface']
-            
-            try:
-                logging.info(f"\n{'='*50}")
-                logging.info(f"Escaneando {network} en {interface}")
-                
-                devices = self.scanner.scan_network(network, interface)
-                if devices:
-                    logging.info(f"Dispositivos encontrados ({len(devices)}):")
-                    for device in devices:
-                        logging.info(f" - IP: {device['ip']} | MAC: {device['mac']}")
-                    all_devices.extend(devices)
-                else:
-                    logging.warning("No se encontraron dispositivos")
-                    
-            except Exception as e:
-                logging.error(f"Error escaneando {network}: {str(e)}")
+            logging.info("Escaneando %s en %s", config['network'], config['interface'])
+        
+        # Todas las redes (y los lotes de las grandes) en el pool del escáner
+        try:
+            results = self.scanner.scan_targets(
+                (config['interface'], config['network']) for config in network_configs)
+        except Exception as e:
+            logging.error("Error escaneando redes: %s", e)
+            return all_devices
+        
+        for network, devices in results:
+            all_devices.extend(self._collect_scan(network, devices))
         
+        # Los repetidos (redes solapadas) se descartan en process_new_devices
         return all_devices
 
-    def process_new_devices(self, devices: List[Dict]) -> None:
+    def _collect_scan(self, network: str, devices: List['Device']) -> List['Device']:
+        """Registra en el log el resultado del escaneo de una red"""
+        logging.info("\n%s", '=' * 50)
+        logging.info("Resultados de %s", network)
+        
+        if devices:
+            logging.info("Dispositivos encontrados (%d):", len(devices))
+            if logging.getLogger().isEnabledFor(logging.INFO):
+                for device in devices:
+                    logging.info(" - IP: %s | MAC: %s", device.ip, device.mac)
+            return devices
+        
+        logging.warning("No se encontraron dispositivos")
+        return []
+
+    def process_new_devices(self, devices: List['Device']) -> None:
         """Procesa nuevos dispositivos con identificación única para remotos"""
-        new_devices = []
+        by_id = {}  # Identificador -> dispositivo, en orden de escaneo
+        seen = set()
         
         for device in devices:
             try:
                 # Para dispositivos remotos sin MAC, usamos IP como identificador
-                device_id = device['ip'] if device['mac'] == '00:00:00:00:00:00' else device['mac']
+                device_id = device.ip if device.mac == '00:00:00:00:00:00' else device.mac
                 
-                if not self.inventory.device_exists(device_id):
-                    try:
-                        self.inventory.add_device(
-                            mac=device['mac'],
-                            ip=device['ip'],
-                            vendor=device.get('vendor', 'Desconocido'),
-                            os_info=device.get('os', 'unknown'),
-                            name=device.get('name', '')
-                        )
-                        new_devices.append(device)
-                        logging.info(f"Nuevo dispositivo registrado: {device['ip']}")
-                    except Exception as e:
-                        logging.error(f"Error registrando {device['ip']}: {str(e)}")
+                # Descartar repetidos del mismo escaneo (redes solapadas, multi-homed)
+                # antes de consultar el inventario; MACs sin distinguir mayúsculas
+                key = device_id.lower()
+                if key in seen:
+                    continue
+                seen.add(key)
+                by_id[device_id] = device
                         
             except Exception as e:
-                logging.error(f"Error procesando dispositivo: {str(e)}")
+                logging.error("Error procesando dispositivo: %s", e)
                 continue
         
+        # Una consulta al inventario por ciclo, no una por dispositivo
+        try:
+            unknown = self.inventory.unknown_ids(by_id)
+        except Exception as e:
+            logging.error("Error consultando el inventario: %s", e)
+            return
+        candidates = [device for device_id, device in by_id.items() if device_id in unknown]
+        
+        # Una única escritura y un único volcado a disco por ciclo de escaneo
+        new_devices = []
+        self.inventory.begin_scan()
+        try:
+            new_devices = self.inventory.add_devices(candidates)
+            for device in new_devices:
+                logging.info("Nuevo dispositivo registrado: %s", device.ip)
+        except Exception as e:
+            logging.error("Error registrando dispositivos: %s", e)
+        finally:
+            self.inventory.end_scan()
+        self.inventory.flush()
+        
         if new_devices:
             self._send_notifications(new_devices)
             
-    def _send_notifications(self, devices: List[Dict]) -> None:
+    def _send_notifications(self, devices: List['Device']) -> None:
         """Envía notificaciones sobre nuevos dispositivos"""
-        if not hasattr(self, 'notifier') or not self.notifier:
-            return
-            
-        for device in devices:
-            try:
-                if not self.notifier.send_alert(device):
-                    logging.warning(f"Fallo al notificar sobre {device['ip']}")
-            except Exception as e:
-                logging.error(f"Error enviando notificación: {str(e)}")
+        # Un único mensaje (o los mínimos) para todos los dispositivos nuevos,
+        # enviado en segundo plano para no retrasar el siguiente escaneo
+        try:
+            self.notifier.enqueue_batch_alert(devices)
+        except Exception as e:
+            logging.error("Error enviando notificación: %s", e)
 
     def run(self):
         """Ejecuta el monitoreo continuo"""
         logging.info("Iniciando NetScanAlert")
+        # Crear los componentes antes del primer ciclo: un error de configuración
+        # (p. ej. TELEGRAM_TIMEOUT no numérico) llega a main() como error de
+        # arranque en lugar de detener el demonio a mitad de un escaneo
+        for component in ('inventory', 'scanner', 'notifier'):
+            getattr(self, component)
         self.running = True
         
         try:
             while self.running:
-                start_time = datetime.now()
+                start_time = time.monotonic()
                 
                 devices = self.scan_networks()
                 self.process_new_devices(devices)
                 
-                elapsed = (datetime.now() - start_time).total_seconds()
+                elapsed = time.monotonic() - start_time
                 sleep_time = max(0, self.scan_interval - elapsed)
                 
                 if sleep_time > 0:
-                    logging.info(f"Esperando {sleep_time:.1f} segundos...")
-                    for _ in range(int(sleep_time * 10)):
-                        if not self.running:
-                            break
-                        time.sleep(0.1)
+                    logging.info("Esperando %.1f segundos...", sleep_time)
+                    if self._stop_event.wait(timeout=sleep_time):
+                        break
                 
         except Exception as e:
-            logging.critical(f"Error crítico: {str(e)}")
+            logging.critical("Error crítico: %s", e)
         finally:
+            # Dar salida a las alertas aún en cola antes de terminar
+            if 'notifier' in self.__dict__:
+                self.notifier.close()
             logging.info("NetScanAlert detenido")
 
 def main():
@@ -178,7 +307,9 @@ def main():
     try:
         # Verificar estructura básica
         required_dirs = ['config', 'data']
-        missing_dirs = [d for d in required_dirs if not (BASE_DIR / d).exists()]
+        with os.scandir(BASE_DIR) as entries:
+            present = {entry.name for entry in entries if entry.is_dir()}
+        missing_dirs = [d for d in required_dirs if d not in present]
         
         if missing_dirs:
             print(f"Error: Directorios faltantes: {', '.join(missing_dirs)}")
@@ -189,7 +320,7 @@ def main():
         NetScanAlert().run()
         
     except Exception as e:
-        logging.critical(f"Error inicializando: {str(e)}")
+        logging.critical("Error inicializando: %s", e)
         sys.exit(1)
 
 if __name__ == "__main__":
@@ -1,24 +1,37 @@
+import json
 import os
+import queue
+import random
+import re
 import requests
+from requests.adapters import HTTPAdapter
+import string
+import threading
 import time
 import logging
-from typing import Dict
+from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 from dotenv import load_dotenv
+from inventory import Device
 
-# Configuración básica de logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+# Logger del módulo; la configuración (nivel, handlers) es cosa de la aplicación
+logger = logging.getLogger(__name__)
+
+# Caracteres que MarkdownV2 obliga a escapar en el texto literal
+_MDV2_ESCAPE = re.compile(r'([_*\[\]()~`>#+\-=|{}.!\\])')
+
+# Variables de entorno cargadas una sola vez, al importar el módulo
+ENV_PATH = Path(__file__).parent.parent / "config" / ".env"
+load_dotenv(dotenv_path=ENV_PATH)
 
 class TelegramNotifier:
+    # Telegram admite 4096 caracteres por mensaje; margen para el formato
+    MAX_MESSAGE_LEN = 4000
+    # Lotes de alertas pendientes de envío en segundo plano
+    MAX_PENDING_BATCHES = 1024
+
     def __init__(self):
         """Inicializa el notificador con configuración desde variables de entorno"""
-        # Cargar variables de entorno
-        env_path = Path(__file__).parent.parent / "config" / ".env"
-        load_dotenv(dotenv_path=env_path)
-        
         # Configuración esencial
         self.bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
         self.chat_id = os.getenv('TELEGRAM_CHAT_ID')
@@ -27,6 +40,13 @@ class TelegramNotifier:
         self.timeout = int(os.getenv('TELEGRAM_TIMEOUT', '10'))
         self.max_retries = int(os.getenv('TELEGRAM_RETRIES', '3'))
         self.retry_delay = int(os.getenv('TELEGRAM_RETRY_DELAY', '2'))
+        self.backoff_cap = float(os.getenv('TELEGRAM_BACKOFF_CAP', '30'))
+        
+        # Formato del mensaje: Markdown (por defecto), MarkdownV2 o texto plano
+        # ('none'), en cuyo caso Telegram no tiene que interpretar nada
+        self.parse_mode = os.getenv('TELEGRAM_PARSE_MODE', 'Markdown').strip()
+        if self.parse_mode.lower() in ('', 'none'):
+            self.parse_mode = None
         
         # Plantilla de mensaje configurable
         self.alert_template = os.getenv(
@@ -37,120 +57,342 @@ class TelegramNotifier:
             '▸ Fabricante: `{vendor}`\n'
             '▸ Hora: `{timestamp}`'
         )
+        
+        # Plantilla analizada una sola vez; _format_message solo la rellena
+        try:
+            self._template_parts: Optional[List[Tuple]] = list(
+                string.Formatter().parse(self.alert_template))
+        except ValueError as e:
+            logger.error("Plantilla ALERT_MESSAGE inválida: %s", e)
+            self._template_parts = None
+        
+        # Sesión persistente: reutiliza la conexión TLS con api.telegram.org
+        # entre alertas. Los reintentos siguen en send_alert (con registro
+        # por intento), por eso el adaptador no reintenta por su cuenta.
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        
+        # URLs de la API construidas una sola vez
+        self._api_url = f"https://api.telegram.org/bot{self.bot_token}"
+        self._send_url = f"{self._api_url}/sendMessage"
+        
+        # Parte fija del cuerpo de sendMessage; por mensaje solo cambia 'text'
+        self._payload_base = {'chat_id': self.chat_id, 'disable_web_page_preview': True}
+        if self.parse_mode:
+            self._payload_base['parse_mode'] = self.parse_mode
+        self._json_headers = {'Content-Type': 'application/json'}
+        
+        # Hilo de envío: quien encola alertas no espera a Telegram (red, reintentos)
+        self._tx_queue = queue.Queue(maxsize=self.MAX_PENDING_BATCHES)
+        self._tx_stop = threading.Event()  # Abandonar reintentos y lotes pendientes
+        self._tx_thread = threading.Thread(target=self._drain, name='telegram-sender', daemon=True)
+        self._tx_thread.start()
+
+    def close(self) -> None:
+        """Envía las alertas pendientes (con espera limitada) y cierra la sesión HTTP"""
+        if self._tx_thread.is_alive():
+            try:
+                self._tx_queue.put_nowait(None)
+            except queue.Full:
+                # Cola llena (Telegram caído): no esperar a vaciarla
+                self._tx_stop.set()
+            self._tx_thread.join(timeout=self._retry_budget())
+            if self._tx_thread.is_alive():
+                logger.warning("Se abandonan %d lotes de alertas pendientes", self._tx_queue.qsize())
+            self._tx_stop.set()
+        self.session.close()
+
+    def _retry_budget(self) -> float:
+        """Tiempo máximo de envío de un lote: todos los intentos y sus esperas"""
+        # Cada backoff está acotado por backoff_cap; el retry_after de un 429 no
+        # (reintentar antes provocaría otro 429), así que puede superar este
+        # presupuesto: entonces close() deja de esperar y _tx_stop corta la espera
+        return self.max_retries * self.timeout + (self.max_retries - 1) * self.backoff_cap
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
 
     def _validate_config(self) -> bool:
         """Valida que la configuración sea correcta"""
         if not self.bot_token or not self.chat_id:
-            logging.error("Configuración incompleta. Se requieren TELEGRAM_BOT_TOKEN y TELEGRAM_CHAT_ID")
+            logger.error("Configuración incompleta. Se requieren TELEGRAM_BOT_TOKEN y TELEGRAM_CHAT_ID")
             return False
         return True
 
-    def _format_message(self, device_info: Dict) -> str:
-        """Formatea el mensaje de alerta usando la plantilla"""
+    def _format_message(self, device: Device, timestamp: Optional[str] = None) -> str:
+        """Formatea el mensaje de alerta usando la plantilla (hora actual si no se indica)"""
+        fields = {
+            'mac': device.mac or 'DESCONOCIDO',
+            'ip': device.ip or 'DESCONOCIDO',
+            'vendor': device.vendor or 'DESCONOCIDO',
+            'timestamp': timestamp or time.strftime('%Y-%m-%d %H:%M:%S')
+        }
+        if self.parse_mode == 'MarkdownV2':
+            # Un '_' o '.' en el fabricante haría que Telegram rechazara el mensaje
+            fields = {key: self._escape(value) for key, value in fields.items()}
+        if self._template_parts is None:
+            return self._escape("⚠️ Nuevo dispositivo detectado (formato incorrecto)")
+        
         try:
-            return self.alert_template.format(
-                mac=device_info.get('mac', 'DESCONOCIDO'),
-                ip=device_info.get('ip', 'DESCONOCIDO'),
-                vendor=device_info.get('vendor', 'DESCONOCIDO'),
-                timestamp=time.strftime('%Y-%m-%d %H:%M:%S')
-            )
+            parts = []
+            for literal, field, spec, conversion in self._template_parts:
+                parts.append(literal)
+                if field is not None:
+                    value = fields[field]
+                    if conversion:
+                        value = {'r': repr, 's': str, 'a': ascii}[conversion](value)
+                    parts.append(format(value, spec))
+            return ''.join(parts)
         except KeyError as e:
-            logging.error(f"Falta clave en device_info: {str(e)}")
-            return "⚠️ Nuevo dispositivo detectado (formato incorrecto)"
+            logger.error("Campo desconocido en la plantilla: %s", e)
+            return self._escape("⚠️ Nuevo dispositivo detectado (formato incorrecto)")
+
+    def _escape(self, text: str) -> str:
+        """Escapa texto literal si el formato es MarkdownV2"""
+        if self.parse_mode == 'MarkdownV2':
+            return _MDV2_ESCAPE.sub(r'\\\1', text)
+        return text
 
-    def send_alert(self, device_info: Dict) -> bool:
+    def send_alert(self, device: Device) -> bool:
         """Envía notificación a Telegram con mejor manejo de errores"""
         if not self._validate_config():
-            logging.error("Configuración de Telegram incompleta")
+            logger.error("Configuración de Telegram incompleta")
             return False
 
         try:
-            message = self._format_message(device_info)
+            message = self._format_message(device)
             if not message:
-                logging.error("No se pudo formatear el mensaje")
+                logger.error("No se pudo formatear el mensaje")
                 return False
 
-            url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
-            payload = {
-                'chat_id': self.chat_id,
-                'text': message,
-                'parse_mode': 'Markdown',
-                'disable_web_page_preview': True
-            }
-
-            for attempt in range(1, self.max_retries + 1):
-                try:
-                    response = requests.post(
-                        url,
-                        json=payload,
-                        timeout=self.timeout
-                    )
-                    
-                    response.raise_for_status()  # Lanza excepción para códigos 4XX/5XX
-                    
-                    logging.info(f"Notificación enviada: {device_info.get('mac')}")
-                    return True
-                    
-                except requests.exceptions.RequestException as e:
-                    error_msg = f"Intento {attempt}: Error al enviar - "
-                    if hasattr(e, 'response') and e.response:
-                        error_msg += f"HTTP {e.response.status_code}: {e.response.text}"
-                    else:
-                        error_msg += str(e)
-                    logging.error(error_msg)
-                    
-                    if attempt < self.max_retries:
-                        time.sleep(self.retry_delay * attempt)
-                        
-            logging.error(f"Fallo después de {self.max_retries} intentos")
-            return False
+            return self._post_message(message, device.mac)
             
         except Exception as e:
-            logging.error(f"Error inesperado al enviar alerta: {str(e)}")
+            logger.error("Error inesperado al enviar alerta: %s", e)
             return False  
+
+    def send_batch_alert(self, devices: List[Device]) -> bool:
+        """
+        Notifica varios dispositivos agrupando sus alertas en el mínimo de
+        mensajes posible (cada uno por debajo de MAX_MESSAGE_LEN).
+        
+        Args:
+            devices: Información de los dispositivos nuevos
+            
+        Returns:
+            bool: True si se enviaron todos los mensajes
+        """
+        if not devices:
+            return True
+        if not self._validate_config():
+            logger.error("Configuración de Telegram incompleta")
+            return False
+
+        try:
+            chunks = []
+            current = ''
+            timestamp = time.strftime('%Y-%m-%d %H:%M:%S')  # Misma hora para todo el lote
+            for device in devices:
+                message = self._format_message(device, timestamp)
+                if current and len(current) + 2 + len(message) > self.MAX_MESSAGE_LEN:
+                    chunks.append(current)
+                    current = message
+                else:
+                    current = f"{current}\n\n{message}" if current else message
+            if current:
+                chunks.append(current)
+            
+            sent_all = True
+            for number, chunk in enumerate(chunks, 1):
+                label = f"lote {number}/{len(chunks)} ({len(devices)} dispositivos)"
+                sent_all = self._post_message(chunk, label) and sent_all
+            return sent_all
+            
+        except Exception as e:
+            logger.error("Error inesperado al enviar alertas: %s", e)
+            return False
+
+    def enqueue_batch_alert(self, devices: List[Device]) -> bool:
+        """
+        Encola la notificación de varios dispositivos; el hilo de envío la
+        manda con send_batch_alert sin bloquear a quien llama.
+        
+        Args:
+            devices: Información de los dispositivos nuevos
+            
+        Returns:
+            bool: False si la cola está llena y las alertas se descartan
+        """
+        if not devices:
+            return True
+        try:
+            self._tx_queue.put_nowait(list(devices))
+            return True
+        except queue.Full:
+            logger.error("Cola de notificaciones llena; se descartan %d alertas", len(devices))
+            return False
+
+    def _drain(self) -> None:
+        """Bucle del hilo de envío: procesa la cola hasta recibir None"""
+        while True:
+            devices = self._tx_queue.get()
+            if devices is None:
+                return
+            try:
+                if not self.send_batch_alert(devices):
+                    logger.warning("Fallo al notificar sobre %d dispositivos", len(devices))
+            except Exception as e:
+                logger.error("Error en el hilo de notificaciones: %s", e)
+            if self._tx_stop.is_set():
+                return
+
+    def _post_message(self, message: str, label: str) -> bool:
+        """
+        Envía un mensaje a Telegram con reintentos.
+        
+        Args:
+            message: Texto ya formateado
+            label: Descripción para el log (MAC o lote)
+            
+        Returns:
+            bool: True si se envió correctamente
+        """
+        # Serializado una sola vez para todos los reintentos
+        body = json.dumps({**self._payload_base, 'text': message}).encode('utf-8')
+
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                response = self.session.post(
+                    self._send_url,
+                    data=body,
+                    headers=self._json_headers,
+                    timeout=self.timeout
+                )
+            except requests.exceptions.RequestException as e:
+                logger.error("Intento %d: Error al enviar - %s", attempt, e)
+                delay = self._backoff(attempt)
+            else:
+                if response.ok:
+                    logger.info("Notificación enviada: %s", label)
+                    return True
+                
+                status = response.status_code
+                logger.error("Intento %d: Error al enviar - HTTP %d: %s", attempt, status, response.text)
+                if status == 429:
+                    # Límite de envío: esperar al menos lo que indica Telegram
+                    delay = max(self._retry_after(response), self._backoff(attempt))
+                elif 400 <= status < 500 and status != 408:
+                    # Error permanente (Markdown inválido, bot bloqueado...): no reintentar
+                    return False
+                else:
+                    delay = self._backoff(attempt)
+            
+            if attempt < self.max_retries and self._tx_stop.wait(delay):
+                logger.error("Envío interrumpido al cerrar: %s", label)
+                return False
+                    
+        logger.error("Fallo después de %d intentos", self.max_retries)
+        return False
+
+    def _backoff(self, attempt: int) -> float:
+        """
+        Espera antes del siguiente intento: exponencial con jitter completo,
+        para que varias instancias no reintenten a la vez.
+        
+        Args:
+            attempt: Número del intento fallido (desde 1)
+            
+        Returns:
+            float: Segundos a esperar
+        """
+        return random.uniform(0, min(self.backoff_cap, self.retry_delay * 2 ** (attempt - 1)))
+
+    @staticmethod
+    def _retry_after(response: requests.Response) -> float:
+        """Segundos de espera pedidos por Telegram en una respuesta 429 (0 si no los indica)"""
+        try:
+            return float(response.json()['parameters']['retry_after'])
+        except (ValueError, KeyError, TypeError):
+            pass
+        try:
+            return float(response.headers.get('Retry-After', 0))
+        except ValueError:
+            return 0
+
     def test_connection(self) -> bool:
         """Prueba la conexión con la API de Telegram"""
         if not self._validate_config():
             return False
 
         try:
-            response = requests.get(
-                f"https://api.telegram.org/bot{self.bot_token}/getMe",
+            response = self.session.get(
+                f"{self._api_url}/getMe",
                 timeout=self.timeout
             )
             
+            # Basta el código de estado; el JSON solo se decodifica si hay error
             if response.status_code == 200:
-                bot_info = response.json()
-                logging.info(f"Conexión exitosa con @{bot_info['result']['username']}")
+                logger.info("Conexión exitosa con la API de Telegram")
                 return True
                 
             error_msg = response.json().get('description', 'Error desconocido')
-            logging.error(f"Error de API: {error_msg}")
+            logger.error("Error de API: %s", error_msg)
             return False
             
         except requests.exceptions.RequestException as e:
-            logging.error(f"Error de conexión: {str(e)}")
+            logger.error("Error de conexión: %s", e)
             return False
         except Exception as e:
-            logging.error(f"Error inesperado: {str(e)}")
+            logger.error("Error inesperado: %s", e)
             return False
 
+    def describe_bot(self) -> Optional[Dict]:
+        """
+        Obtiene los datos del bot (getMe). Solo para uso explícito: la prueba
+        de conexión no los necesita.
+        
+        Returns:
+            Dict con la información del bot, o None si no se pudo obtener
+        """
+        if not self._validate_config():
+            return None
+
+        try:
+            response = self.session.get(
+                f"{self._api_url}/getMe",
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+            return response.json().get('result')
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.error("Error obteniendo datos del bot: %s", e)
+            return None
+
 
 if __name__ == "__main__":
     # Prueba de funcionamiento
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
     print("=== Prueba de TelegramNotifier ===")
-    notifier = TelegramNotifier()
-    
-    if notifier.test_connection():
-        print("\nProbando envío de mensaje...")
-        test_device = {
-            'mac': '00:11:22:33:44:55',
-            'ip': '192.168.1.100',
-            'vendor': 'Fabricante de prueba'
-        }
-        if notifier.send_alert(test_device):
-            print("✅ Prueba exitosa! Revisa tu Telegram")
+    with TelegramNotifier() as notifier:
+        if notifier.test_connection():
+            bot_info = notifier.describe_bot()
+            if bot_info:
+                print(f"Bot: @{bot_info.get('username')}")
+            print("\nProbando envío de mensaje...")
+            test_device = Device(
+                mac='00:11:22:33:44:55',
+                ip='192.168.1.100',
+                vendor='Fabricante de prueba'
+            )
+            if notifier.send_alert(test_device):
+                print("✅ Prueba exitosa! Revisa tu Telegram")
+            else:
+                print("❌ Fallo al enviar. Revisa los logs")
         else:
-            print("❌ Fallo al enviar. Revisa los logs")
-    else:
-        print("❌ Conexión fallida. Verifica tu configuración")
\ No newline at end of file
+            print("❌ Conexión fallida. Verifica tu configuración")
\ No newline at end of file
@@ -1,90 +1,308 @@
 #!/usr/bin/env python3
+import functools
 import subprocess
 import re
 import ipaddress
 import logging
 import netifaces
+import os
+import shutil
 import socket
-from typing import List, Dict
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 from pathlib import Path
-from inventory import FileInventory
+from inventory import Device, FileInventory, parse_network
 
-# Configuración básica de logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+# scapy es opcional: si está instalado, el escaneo ARP local se hace en el
+# propio proceso en lugar de lanzar arp-scan
+try:
+    from scapy.all import ARP, Ether, srp
+    _HAS_SCAPY = True
+except ImportError:
+    _HAS_SCAPY = False
+
+# Logger del módulo; la configuración (nivel, handlers) es cosa de la aplicación
+logger = logging.getLogger(__name__)
+
+# Expresiones compiladas una sola vez al importar el módulo; la salida de
+# arp y nmap es ASCII, así \d y \s no consultan propiedades Unicode
+_ARP_ALT_RE = re.compile(r'^\S+\s+\(([\d\.]+)\)\s+at\s+([0-9A-Fa-f:]+)\s+\[ether\]\s+on\s+\S+$', re.ASCII)
+_NMAP_RE = re.compile(r'Nmap scan report for ([\d\.]+)$', re.ASCII)
+# Normaliza una MAC a mayúsculas separada por ':' en una sola pasada
+_MAC_TR = str.maketrans('abcdef-', 'ABCDEF:')
+# Equivalentes en bytes para validar la salida de arp-scan antes de decodificarla
+_MAC_TR_BYTES = bytes.maketrans(b'abcdef-', b'ABCDEF:')
+_HEX_BYTES = frozenset(b'0123456789abcdefABCDEF')
+
+def _parse_mac(mac: bytes) -> Optional[str]:
+    """
+    Valida una MAC de 17 bytes (separada por ':' o '-') sin regex:
+    separadores en posiciones fijas y dígitos hexadecimales en el resto.
+    
+    Args:
+        mac: MAC tal como la imprime arp-scan, sin decodificar
+        
+    Returns:
+        MAC en mayúsculas separada por ':', o None si no es válida
+    """
+    if len(mac) != 17 or mac[2::3] not in (b':::::', b'-----'):
+        return None
+    if not _HEX_BYTES.issuperset(mac[0::3] + mac[1::3]):
+        return None
+    return mac.translate(_MAC_TR_BYTES).decode('ascii')
+
+def _parse_network(network: str) -> Optional[Union[ipaddress.IPv4Network, ipaddress.IPv6Network]]:
+    """Red CIDR parseada con la caché de inventory.parse_network; None si no es válida"""
+    try:
+        return parse_network(network)
+    except ValueError:
+        return None
+
+# Bit de CAP_NET_RAW y flag de capacidades efectivas en security.capability
+_CAP_NET_RAW = 13
+_VFS_CAP_FLAGS_EFFECTIVE = 0x1
+
+def _has_net_raw(path: str) -> bool:
+    """Indica si un ejecutable tiene cap_net_raw efectiva (setcap cap_net_raw+ep)"""
+    try:
+        data = os.getxattr(path, 'security.capability')
+    except (OSError, AttributeError):
+        return False
+    if len(data) < 8:
+        return False
+    magic_etc, permitted = struct.unpack_from('<II', data)
+    return bool(magic_etc & _VFS_CAP_FLAGS_EFFECTIVE and permitted & (1 << _CAP_NET_RAW))
+
+def _arp_scan_argv() -> Tuple[str, ...]:
+    """
+    Elige cómo lanzar arp-scan: sin sudo si el proceso ya es root o el
+    binario tiene cap_net_raw; con sudo (y la ruta de sudoers) en otro caso.
+    """
+    path = shutil.which('arp-scan')
+    if path and (os.geteuid() == 0 or _has_net_raw(path)):
+        return (path,)
+    return ('sudo', 'arp-scan')
+
+# Base de datos IEEE de fabricantes que instala arp-scan ("OUI<TAB>nombre")
+OUI_FILE = Path('/usr/share/arp-scan/ieee-oui.txt')
+
+@functools.lru_cache(maxsize=1)
+def _load_oui() -> Dict[bytes, str]:
+    """
+    Carga OUI_FILE una sola vez por proceso.
+    
+    Returns:
+        Dict con los 3 primeros bytes de la MAC como clave (vacío si no existe)
+    """
+    oui = {}
+    try:
+        with open(OUI_FILE, encoding='utf-8', errors='replace') as f:
+            for line in f:
+                prefix, sep, name = line.partition('\t')
+                if not sep or len(prefix) != 6 or line.startswith('#'):
+                    continue
+                try:
+                    oui[bytes.fromhex(prefix)] = name.strip()
+                except ValueError:
+                    continue
+    except OSError as e:
+        logger.debug("Base de datos OUI no disponible: %s", e)
+    return oui
+
+def lookup_vendor(mac: str, default: str = 'Desconocido') -> str:
+    """Obtiene el fabricante de una MAC (aa:bb:cc:...) a partir de su OUI"""
+    try:
+        return _load_oui().get(bytes.fromhex(mac[:8].replace(':', '')), default)
+    except ValueError:
+        return default
 
 class NetworkScanner:
-    def __init__(self, inventory: FileInventory):
-        """Inicializa el escáner de red"""
+    # Segundos durante los que se reutilizan las redes locales detectadas
+    LOCAL_NETWORKS_TTL = 60
+    # Escaneos (lotes) simultáneos como máximo en scan_targets, por defecto
+    MAX_PARALLEL_SCANS = 16
+    # Intentos por host de arp-scan (--retry); cada uno espera 1.5 veces el
+    # anterior (--backoff por defecto)
+    ARP_RETRIES = 2
+    ARP_BACKOFF = 1.5
+    # Segundos extra del timeout total de arp-scan: arranque y envío de paquetes
+    ARP_SCAN_MARGIN = 4
+
+    def __init__(self, inventory: Optional[FileInventory] = None, arp_timeout: int = 500,
+                 scan_batch_size: int = 256, max_parallel_scans: int = MAX_PARALLEL_SCANS):
+        """
+        Inicializa el escáner de red.
+        
+        Args:
+            inventory: Sin uso; se mantiene solo por compatibilidad con quien
+                       lo pasa como primer argumento posicional
+            arp_timeout: Espera por host de arp-scan en ms (500, el valor de
+                         arp-scan). El tiempo de un lote sin respuestas es
+                         aproximadamente arp_timeout × reintentos
+            scan_batch_size: Máximo de direcciones por invocación de arp-scan:
+                             una /24 cabe holgada en su timeout, una /16 entera no
+            max_parallel_scans: Escaneos (lotes) simultáneos como máximo
+        """
         self.inventory = inventory
-        self.arp_timeout = 2000
+        self.arp_timeout = arp_timeout
         self.nmap_timeout = 5000
-        self.local_networks = self._get_local_networks()
+        self.scan_batch_size = scan_batch_size
+        self.max_parallel_scans = max(1, max_parallel_scans)
+        # Inicio fijo del comando arp-scan, decidido una vez al arrancar
+        self._arp_scan_argv = _arp_scan_argv()
+        self._use_scapy = _HAS_SCAPY
+        self._local_networks_ts = float('-inf')
+        self._refresh_local_networks()
+
+    @property
+    def local_networks(self) -> List[ipaddress.IPv4Network]:
+        """Redes locales, volviendo a consultar las interfaces cuando caduca el TTL"""
+        self._refresh_local_networks()
+        return self._local_networks
+
+    def _refresh_local_networks(self) -> None:
+        """Vuelve a detectar las redes locales si ha caducado el TTL"""
+        if time.monotonic() - self._local_networks_ts <= self.LOCAL_NETWORKS_TTL:
+            return
+        # Recoge cambios de DHCP o interfaces sin consultarlas en cada escaneo
+        networks = self._get_local_networks()
+        # (versión, red entera, máscara entera) para comparar sin crear objetos
+        self._local_masks = [(net.version, int(net.network_address), int(net.netmask))
+                             for net in networks]
+        self._local_networks = networks
+        self._local_networks_ts = time.monotonic()
         
-    def _get_local_networks(self) -> List[str]:
+    def _get_local_networks(self) -> List[ipaddress.IPv4Network]:
         """Obtiene redes locales de interfaces activas"""
         local_nets = []
         for interface in netifaces.interfaces():
             try:
-                if interface == 'lo' or not netifaces.AF_INET in netifaces.ifaddresses(interface):
+                if interface == 'lo':
                     continue
                     
-                for addr in netifaces.ifaddresses(interface)[netifaces.AF_INET]:
+                for addr in netifaces.ifaddresses(interface).get(netifaces.AF_INET, []):
                     if 'addr' in addr and 'netmask' in addr:
                         network = ipaddress.ip_network(
                             f"{addr['addr']}/{addr['netmask']}", 
                             strict=False
                         )
-                        local_nets.append(str(network))
+                        local_nets.append(network)
             except Exception as e:
-                logging.debug(f"Error obteniendo red para {interface}: {str(e)}")
+                logger.debug("Error obteniendo red para %s: %s", interface, e)
         return local_nets
 
     def _is_local_network(self, network: str) -> bool:
         """Determina si una red es local"""
-        try:
-            target_net = ipaddress.ip_network(network, strict=False)
-            for local_net in self.local_networks:
-                if target_net.subnet_of(ipaddress.ip_network(local_net)):
-                    return True
-            return False
-        except ValueError as e:
-            logging.error(f"Error validando red {network}: {str(e)}")
+        target_net = _parse_network(network)
+        if target_net is None:
+            logger.error("Error validando red %s: no es una red válida", network)
             return False
+        
+        target_int = int(target_net.network_address)
+        target_mask = int(target_net.netmask)
+        self._refresh_local_networks()
+        # Subred de una red local: máscara igual o más larga y mismos bits de red
+        return any(version == target_net.version
+                   and target_mask & mask == mask
+                   and target_int & mask == net_int
+                   for version, net_int, mask in self._local_masks)
 
-    def _scan_local_with_arp(self, network: str, interface: str) -> List[Dict]:
-        """Escaneo ARP mejorado"""
+    def _scan_local_with_scapy(self, network: str, interface: str,
+                               timeout_ms: int) -> Optional[List[Device]]:
+        """
+        Escaneo ARP dentro del proceso con scapy, sin subproceso ni parseo de texto.
+        
+        Args:
+            network: Red local en notación CIDR
+            interface: Interfaz por la que enviar las peticiones
+            timeout_ms: Espera de respuestas en ms
+            
+        Returns:
+            Dispositivos encontrados, o None si scapy no pudo usarse
+        """
+        try:
+            answered, _ = srp(
+                Ether(dst='ff:ff:ff:ff:ff:ff') / ARP(pdst=network),
+                timeout=timeout_ms / 1000,
+                retry=2,
+                iface=interface,
+                verbose=False
+            )
+        except PermissionError:
+            # Sin CAP_NET_RAW no tiene sentido reintentarlo en cada escaneo
+            logger.warning("scapy requiere CAP_NET_RAW; se usará arp-scan")
+            self._use_scapy = False
+            return None
+        except Exception as e:
+            logger.error("Error en escaneo ARP con scapy: %s", e)
+            return None
+        
+        return [Device(mac=reply.hwsrc.translate(_MAC_TR), ip=reply.psrc,
+                       vendor=lookup_vendor(reply.hwsrc))
+                for _, reply in answered]
+
+    def _scan_local_with_arp(self, network: str, interface: str,
+                             timeout_ms: Optional[int] = None) -> List[Device]:
+        """Escaneo ARP mejorado (timeout_ms por host; arp_timeout si no se indica)"""
+        timeout_ms = timeout_ms or self.arp_timeout
+        if self._use_scapy:
+            devices = self._scan_local_with_scapy(network, interface, timeout_ms)
+            if devices is not None:
+                return devices
+        
         try:
             cmd = [
-                'sudo', 'arp-scan',
+                *self._arp_scan_argv,
                 '-I', interface,
-                '--timeout=1000',  # 1 segundo
-                '--retry=2',
+                f'--timeout={timeout_ms}',
+                f'--retry={self.ARP_RETRIES}',
                 network
             ]
             
-            result = subprocess.run(
+            # La salida se procesa línea a línea mientras arp-scan la produce
+            # (en bytes: solo se decodifican los campos de cada dispositivo);
+            # el temporizador termina el proceso si se supera el timeout
+            timed_out = threading.Event()
+            with subprocess.Popen(
                 cmd,
-                capture_output=True,
-                text=True,
-                timeout=5  # Timeout total de 5 segundos
-            )
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL
+            ) as proc:
+                def expire():
+                    timed_out.set()
+                    proc.terminate()
+                
+                timer = threading.Timer(self._arp_scan_deadline(timeout_ms), expire)
+                timer.daemon = True
+                timer.start()
+                try:
+                    devices = self._parse_arp_output(proc.stdout)
+                    returncode = proc.wait()
+                finally:
+                    timer.cancel()
             
-            if result.returncode == 0:
-                return self._parse_arp_output(result.stdout)
+            if timed_out.is_set():
+                logger.warning("ARP-scan timeout, intentando con método alternativo")
+                return self._scan_local_alternative(network, interface)
+            
+            if returncode == 0:
+                return devices
             
-            logging.error(f"ARP-scan falló. Código: {result.returncode}")
+            logger.error("ARP-scan falló. Código: %s", returncode)
             return []
-        except subprocess.TimeoutExpired:
-            logging.warning("ARP-scan timeout, intentando con método alternativo")
-            return self._scan_local_alternative(network, interface)
         except Exception as e:
-            logging.error(f"Error en ARP-scan: {str(e)}")
+            logger.error("Error en ARP-scan: %s", e)
             return []
 
-    def _scan_local_alternative(self, network: str, interface: str) -> List[Dict]:
+    def _arp_scan_deadline(self, timeout_ms: int) -> float:
+        """Timeout total de arp-scan en segundos: la espera de todos sus intentos más margen"""
+        waits = sum(self.ARP_BACKOFF ** attempt for attempt in range(self.ARP_RETRIES))
+        return timeout_ms / 1000 * waits + self.ARP_SCAN_MARGIN
+
+    def _scan_local_alternative(self, network: str, interface: str) -> List[Device]:
         """Método alternativo para escaneo local"""
         try:
             cmd = ['sudo', 'arp', '-a', '-i', interface]
@@ -96,40 +314,68 @@ class NetworkScanner:
             )
             return self._parse_arp_output_alternative(result.stdout)
         except Exception as e:
-            logging.error(f"Error en escaneo alternativo: {str(e)}")
+            logger.error("Error en escaneo alternativo: %s", e)
             return []
 
-    def _parse_arp_output(self, output: str) -> List[Dict]:
-        """Procesa la salida de arp-scan"""
+    def _parse_arp_output(self, lines: Iterable[bytes]) -> List[Device]:
+        """Procesa la salida de arp-scan (líneas en bytes o el pipe del proceso)"""
         devices = []
-        pattern = re.compile(r'^\s*((?:\d{1,3}\.){3}\d{1,3})\s+((?:[0-9A-Fa-f]{2}[:-]){5}[0-9A-Fa-f]{2})\s+(.+?)\s*$', re.MULTILINE)
-        
-        for match in pattern.finditer(output):
-            ip, mac, vendor = match.groups()
-            devices.append({
-                'ip': ip,
-                'mac': mac.upper().replace('-', ':'),
-                'vendor': vendor.strip()
-            })
+        seen_macs = set()  # arp-scan repite las respuestas duplicadas (DUP)
+        for line in lines:
+            device = self._parse_arp_line(line)
+            if device and device.mac not in seen_macs:
+                seen_macs.add(device.mac)
+                devices.append(device)
         return devices
 
-    def _parse_arp_output_alternative(self, output: str) -> List[Dict]:
+    @staticmethod
+    def _parse_arp_line(line: bytes) -> Optional[Device]:
+        """
+        Procesa una línea "IP  MAC  [fabricante]" de arp-scan con split en vez
+        de regex. Sin columna de fabricante (arp-scan -q) se busca por OUI.
+        
+        Args:
+            line: Línea de la salida de arp-scan, sin decodificar
+            
+        Returns:
+            Device, o None si la línea no es un dispositivo (cabecera, resumen)
+        """
+        # Cabeceras, resumen y líneas vacías no empiezan por dígito:
+        # se descartan sin partir la línea
+        if not line[:1].isdigit():
+            return None
+        parts = line.split(None, 2)
+        if len(parts) < 2:
+            return None
+        
+        mac = _parse_mac(parts[1])
+        if mac is None:
+            return None
+        try:
+            ip = parts[0].decode('ascii')
+            socket.inet_pton(socket.AF_INET, ip)
+        except (UnicodeDecodeError, OSError):
+            return None
+        
+        # El fabricante puede traer bytes no UTF-8; no debe tumbar el escaneo
+        if len(parts) == 3:
+            vendor = parts[2].decode('utf-8', 'replace').strip()
+        else:
+            vendor = lookup_vendor(mac)
+        return Device(mac=mac, ip=ip, vendor=vendor)
+
+    def _parse_arp_output_alternative(self, output: str) -> List[Device]:
         """Procesa la salida alternativa de arp"""
         devices = []
-        pattern = re.compile(r'^\S+\s+\(([\d\.]+)\)\s+at\s+([0-9A-Fa-f:]+)\s+\[ether\]\s+on\s+\S+$')
-        
         for line in output.splitlines():
-            match = pattern.match(line)
+            match = _ARP_ALT_RE.match(line)
             if match:
                 ip, mac = match.groups()
-                devices.append({
-                    'ip': ip,
-                    'mac': mac.upper(),
-                    'vendor': 'Desconocido'
-                })
+                devices.append(Device(mac=mac.translate(_MAC_TR), ip=ip,
+                                      vendor=lookup_vendor(mac)))
         return devices
 
-    def _scan_remote_with_nmap(self, network: str) -> List[Dict]:
+    def _scan_remote_with_nmap(self, network: str) -> List[Device]:
         """Escaneo remoto que devuelve dispositivos válidos"""
         try:
             cmd = [
@@ -151,43 +397,164 @@ class NetworkScanner:
             )
             
             if result.returncode == 0:
-                devices = self._parse_nmap_output(result.stdout)
-                # Filtrar IPs inválidas
-                return [d for d in devices if self.inventory.validate_ip(d['ip'])]
+                # Las IPs se validan al parsear, contra la red escaneada
+                target_net = _parse_network(network)
+                if target_net is None:
+                    logger.error("Red inválida para Nmap: %s", network)
+                    return []
+                return self._parse_nmap_output(result.stdout, target_net)
                 
-            logging.error(f"Nmap falló. Código: {result.returncode}")
+            logger.error("Nmap falló. Código: %s", result.returncode)
             return []
         except Exception as e:
-            logging.error(f"Error en Nmap: {str(e)}")
+            logger.error("Error en Nmap: %s", e)
             return []
     
-    def _parse_nmap_output(self, output: str) -> List[Dict]:
-        """Procesa la salida de nmap con IP única"""
+    def _parse_nmap_output(self, output: str,
+                           target_net: ipaddress.IPv4Network) -> List[Device]:
+        """
+        Procesa la salida de nmap con IP única.
+        
+        Args:
+            output: Salida de nmap -sn
+            target_net: Red escaneada; se descartan IPs inválidas o fuera de ella
+            
+        Returns:
+            Dispositivos remotos (sin MAC)
+        """
         devices = []
-        ip_pattern = re.compile(r'Nmap scan report for ([\d\.]+)$')
-        seen_ips = set()
+        seen_ips = set()  # IPs como enteros: hash y comparación más baratos
         
         for line in output.splitlines():
-            if ip_match := ip_pattern.match(line):
-                ip = ip_match.group(1)
-                if ip not in seen_ips:
-                    seen_ips.add(ip)
-                    devices.append({
-                        'ip': ip,
-                        'mac': '00:00:00:00:00:00',
-                        'vendor': 'Desconocido'
-                    })
+            if ip_match := _NMAP_RE.match(line):
+                try:
+                    ip = ipaddress.IPv4Address(ip_match.group(1))
+                except ValueError:
+                    continue
+                ip_int = int(ip)
+                if ip_int in seen_ips or ip not in target_net:
+                    continue
+                seen_ips.add(ip_int)
+                devices.append(Device(mac='00:00:00:00:00:00', ip=str(ip)))
         return devices
     
-    def scan_network(self, network: str, interface: str = 'eth0') -> List[Dict]:
-        """Escanea una red con el método apropiado"""
+    def scan_network(self, network: str, interface: str = 'eth0',
+                     timeout_ms: Optional[int] = None) -> List[Device]:
+        """Escanea una red con el método apropiado (timeout_ms: espera ARP por host)"""
+        return self.scan_networks([network], interface, timeout_ms)
+
+    def _plan_scan(self, network: str, interface: str) -> List[Tuple[str, bool]]:
+        """
+        Decide cómo escanear una red: las locales grandes se dividen en lotes.
+        
+        Args:
+            network: Red en notación CIDR
+            interface: Interfaz para las redes locales
+            
+        Returns:
+            Pares (subred, es_local) a escanear
+        """
+        if not self._is_local_network(network):
+            logger.info("[REMOTA] Escaneando %s", network)
+            return [(network, False)]
+        
+        batches = self._split_network(network)
+        if len(batches) > 1:
+            logger.info("[LOCAL] Escaneando %s en %d lotes en %s", network, len(batches), interface)
+        else:
+            logger.info("[LOCAL] Escaneando %s en %s", network, interface)
+        return [(batch, True) for batch in batches]
+
+    def _scan_batch(self, network: str, interface: str, local: bool,
+                    timeout_ms: Optional[int] = None) -> List[Device]:
+        """Escanea un lote ya planificado (ARP si es local, nmap si es remoto)"""
         try:
-            if self._is_local_network(network):
-                logging.info(f"[LOCAL] Escaneando {network} en {interface}")
-                return self._scan_local_with_arp(network, interface)
-            else:
-                logging.info(f"[REMOTA] Escaneando {network}")
-                return self._scan_remote_with_nmap(network)
+            if local:
+                return self._scan_local_with_arp(network, interface, timeout_ms)
+            return self._scan_remote_with_nmap(network)
         except Exception as e:
-            logging.error(f"Error escaneando {network}: {str(e)}")
-            return []
\ No newline at end of file
+            logger.error("Error escaneando %s: %s", network, e)
+            return []
+
+    def _split_network(self, network: str) -> List[str]:
+        """
+        Divide una red en subredes de como mucho scan_batch_size direcciones.
+        
+        Args:
+            network: Red en notación CIDR
+            
+        Returns:
+            Subredes en notación CIDR ([network] si ya cabe en un lote)
+        """
+        net = _parse_network(network)
+        if net is None or net.num_addresses <= self.scan_batch_size:
+            return [network]
+        new_prefix = net.max_prefixlen - (self.scan_batch_size.bit_length() - 1)
+        return [str(subnet) for subnet in net.subnets(new_prefix=new_prefix)]
+
+    def scan_targets(self, targets: Iterable[Tuple[str, str]],
+                     timeout_ms: Optional[int] = None) -> List[Tuple[str, List[Device]]]:
+        """
+        Escanea varias redes, cada una por su interfaz, en un único pool: los
+        lotes de las redes locales grandes comparten el límite de
+        max_parallel_scans con el resto de redes, sin pools anidados.
+        
+        Args:
+            targets: Pares (interfaz, red en notación CIDR)
+            timeout_ms: Espera ARP por host en ms (arp_timeout si no se indica)
+            
+        Returns:
+            Pares (red, dispositivos encontrados) en el orden de targets
+        """
+        targets = list(targets)
+        jobs = []  # (índice del destino, subred, interfaz, es_local)
+        for index, (interface, network) in enumerate(targets):
+            try:
+                plan = self._plan_scan(network, interface)
+            except Exception as e:
+                logger.error("Error escaneando %s: %s", network, e)
+                continue
+            jobs.extend((index, batch, interface, local) for batch, local in plan)
+        
+        results = [[] for _ in targets]
+        if len(jobs) == 1:
+            # Un solo lote: sin pool de hilos
+            index, *job = jobs[0]
+            results[index] = self._scan_batch(*job, timeout_ms)
+        elif jobs:
+            # Cada escaneo espera E/S de su propio subproceso y no modifica
+            # estado compartido
+            workers = min(self.max_parallel_scans, len(jobs))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                scans = executor.map(lambda job: self._scan_batch(*job[1:], timeout_ms), jobs)
+                for (index, *_), devices in zip(jobs, scans):
+                    results[index].extend(devices)
+        
+        return [(network, devices) for (_, network), devices in zip(targets, results)]
+
+    def scan_networks(self, networks: List[str], interface: str = 'eth0',
+                      timeout_ms: Optional[int] = None) -> List[Device]:
+        """
+        Escanea varias redes en paralelo (ver scan_targets).
+        
+        Args:
+            networks: Redes en notación CIDR
+            interface: Interfaz para las redes locales
+            timeout_ms: Espera ARP por host en ms (arp_timeout si no se indica)
+            
+        Returns:
+            Dispositivos de todas las redes, en el orden de las redes y sin
+            repetir MAC (IP para remotos sin MAC)
+        """
+        results = self.scan_targets([(interface, network) for network in networks], timeout_ms)
+        return self.unique_devices(device for _, devices in results for device in devices)
+
+    @staticmethod
+    def unique_devices(devices: Iterable[Device]) -> List[Device]:
+        """Descarta repetidos por MAC (IP para remotos sin MAC), en orden de aparición"""
+        # Redes solapadas: un mismo dispositivo puede aparecer en varios escaneos
+        unique = {}
+        for device in devices:
+            key = device.ip if device.mac == '00:00:00:00:00:00' else device.mac
+            unique.setdefault(key, device)
+        return list(unique.values())
\ No newline at end of file
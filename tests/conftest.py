@@ -0,0 +1,10 @@
+import logging
+import sys
+from pathlib import Path
+
+# Los módulos de src/ se importan por nombre, como al ejecutar desde src/
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+# netScanAlert configura el logging (con un archivo en ../log) solo si nadie
+# lo ha hecho antes; un handler nulo evita que lo haga al importarlo en tests
+logging.getLogger().addHandler(logging.NullHandler())
@@ -0,0 +1,75 @@
+import pytest
+
+from inventory import Device, FileInventory
+
+
+@pytest.fixture
+def inventory(tmp_path):
+    with FileInventory(tmp_path) as inv:
+        yield inv
+
+
+def _status(inventory, mac):
+    """Estado guardado en devices.csv para una MAC"""
+    return {record.mac: record.status for record in inventory.get_all_devices()}[mac]
+
+
+def test_add_devices_returns_only_added(inventory):
+    valid = Device(mac='AA:BB:CC:DD:EE:01', ip='10.0.0.1')
+    invalid = Device(mac='AA:BB:CC:DD:EE:02', ip='10.0.0.300')
+
+    assert inventory.add_devices([valid, invalid]) == [valid]
+    assert [record.mac for record in inventory.get_all_devices()] == ['aa:bb:cc:dd:ee:01']
+
+
+def test_blacklist_takes_precedence_over_whitelist(inventory):
+    inventory.whitelist_device('aa:bb:cc:dd:ee:01')
+    inventory.blacklist_device('AA-BB-CC-DD-EE-01')
+
+    inventory.add_devices([Device(mac='AA:BB:CC:DD:EE:01', ip='10.0.0.1')])
+
+    assert _status(inventory, 'aa:bb:cc:dd:ee:01') == 'blocked'
+
+
+def test_whitelisted_mac_is_authorized(inventory):
+    inventory.whitelist_device('AA-BB-CC-DD-EE-01')
+
+    inventory.add_devices([Device(mac='aa:bb:cc:dd:ee:01', ip='10.0.0.1'),
+                           Device(mac='aa:bb:cc:dd:ee:02', ip='10.0.0.2')])
+
+    assert _status(inventory, 'aa:bb:cc:dd:ee:01') == 'authorized'
+    assert _status(inventory, 'aa:bb:cc:dd:ee:02') == 'unknown'
+
+
+@pytest.mark.parametrize('listed, seen', [
+    ('10.0.0.1', '10.0.0.1'),
+    ('2001:db8::1', '2001:0db8:0000:0000:0000:0000:0000:0001'),
+    ('2001:0DB8::0:1', '2001:db8::1'),
+])
+def test_whitelisted_ip_matches_any_spelling(inventory, listed, seen):
+    inventory.whitelist_device(listed)
+
+    inventory.add_devices([Device(mac='aa:bb:cc:dd:ee:01', ip=seen)])
+
+    assert _status(inventory, 'aa:bb:cc:dd:ee:01') == 'authorized'
+
+
+def test_whitelist_devices_counts_batch_duplicates_once(inventory):
+    batch = ['aa:bb:cc:dd:ee:01', 'AA-BB-CC-DD-EE-01', '10.0.0.1', '10.0.0.1']
+
+    assert inventory.whitelist_devices(batch) == (2, 0)
+    assert inventory.whitelist_devices(['aa:bb:cc:dd:ee:01', '10.0.0.2']) == (1, 1)
+
+
+def test_whitelist_devices_rejects_invalid_identifier(inventory):
+    with pytest.raises(ValueError):
+        inventory.whitelist_devices(['10.0.0.1', 'no-es-mac'])
+    assert inventory.whitelist_devices(['10.0.0.1']) == (1, 0)
+
+
+def test_unknown_ids_ignores_mac_case(inventory):
+    inventory.add_devices([Device(mac='aa:bb:cc:dd:ee:01', ip='10.0.0.1')])
+
+    unknown = inventory.unknown_ids(['AA:BB:CC:DD:EE:01', '10.0.0.1', '10.0.0.2'])
+
+    assert unknown == {'10.0.0.2'}
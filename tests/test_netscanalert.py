@@ -0,0 +1,39 @@
+import pytest
+
+from netScanAlert import _parse_networks
+
+
+@pytest.fixture
+def networks_file(tmp_path):
+    def write(text):
+        path = tmp_path / 'networks.txt'
+        path.write_text(text)
+        return str(path)
+    return write
+
+
+@pytest.mark.parametrize('line, expected', [
+    ('10.0.0.0/24', ('eth0', '10.0.0.0/24')),
+    ('enp0s3:10.0.2.0/24', ('enp0s3', '10.0.2.0/24')),
+    ('eth0 : 192.168.4.0/24  # oficina', ('eth0', '192.168.4.0/24')),
+    ('cafe:10.1.0.0/24', ('cafe', '10.1.0.0/24')),
+    ('eth0:1:10.2.0.0/24', ('eth0:1', '10.2.0.0/24')),
+    ('eth0.10:10.3.0.0/24', ('eth0.10', '10.3.0.0/24')),
+    ('eth1:fe80::/64', ('eth1', 'fe80::/64')),
+    ('fe80::/64', ('eth0', 'fe80::/64')),
+])
+def test_network_line(networks_file, line, expected):
+    assert _parse_networks(networks_file(line + '\n'), 0) == (expected,)
+
+
+def test_comments_blank_and_invalid_lines_are_skipped(networks_file):
+    path = networks_file(
+        '# Formato: interfaz:red\n'
+        '\n'
+        '#10.9.0.0/24\n'
+        'eth0:300.0.0.0/24\n'
+        'no es una red\n'
+        'eth0:10.0.0.0/24\n'
+    )
+
+    assert _parse_networks(path, 0) == (('eth0', '10.0.0.0/24'),)
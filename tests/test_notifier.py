@@ -0,0 +1,61 @@
+import pytest
+
+from inventory import Device
+from notifier import TelegramNotifier
+
+
+@pytest.fixture
+def make_notifier(monkeypatch):
+    """Crea notificadores con la configuración indicada; los mensajes se capturan"""
+    created = []
+
+    def make(parse_mode='Markdown', template='{mac} {vendor}'):
+        monkeypatch.setenv('TELEGRAM_BOT_TOKEN', '123456:test')
+        monkeypatch.setenv('TELEGRAM_CHAT_ID', '1')
+        monkeypatch.setenv('TELEGRAM_PARSE_MODE', parse_mode)
+        monkeypatch.setenv('ALERT_MESSAGE', template)
+        notifier = TelegramNotifier()
+        notifier.sent = []
+        notifier._post_message = lambda message, label: notifier.sent.append(message) or True
+        created.append(notifier)
+        return notifier
+
+    yield make
+    for notifier in created:
+        notifier.close()
+
+
+def test_markdownv2_escapes_fields(make_notifier):
+    notifier = make_notifier(parse_mode='MarkdownV2')
+    device = Device(mac='aa:bb:cc:dd:ee:01', ip='10.0.0.1', vendor='Acme_Corp. (v1)')
+
+    assert notifier._format_message(device) == r'aa:bb:cc:dd:ee:01 Acme\_Corp\. \(v1\)'
+
+
+def test_markdown_leaves_fields_unescaped(make_notifier):
+    notifier = make_notifier(parse_mode='Markdown')
+    device = Device(mac='aa:bb:cc:dd:ee:01', ip='10.0.0.1', vendor='Acme_Corp.')
+
+    assert notifier._format_message(device) == 'aa:bb:cc:dd:ee:01 Acme_Corp.'
+
+
+def test_batch_fits_in_one_message(make_notifier):
+    notifier = make_notifier()
+    devices = [Device(mac=f'aa:bb:cc:dd:ee:{i:02x}', ip=f'10.0.0.{i}') for i in range(3)]
+
+    assert notifier.send_batch_alert(devices)
+    assert len(notifier.sent) == 1
+    assert all(device.mac in notifier.sent[0] for device in devices)
+
+
+def test_batch_is_split_below_message_limit(make_notifier):
+    notifier = make_notifier()
+    devices = [Device(mac=f'aa:bb:cc:dd:{i // 256:02x}:{i % 256:02x}', ip='10.0.0.1',
+                      vendor='x' * 200)
+               for i in range(100)]
+
+    assert notifier.send_batch_alert(devices)
+    assert len(notifier.sent) > 1
+    assert all(len(message) <= TelegramNotifier.MAX_MESSAGE_LEN for message in notifier.sent)
+    # Ningún dispositivo se pierde ni se parte entre mensajes
+    assert sum(message.count('aa:bb:cc:dd:') for message in notifier.sent) == len(devices)